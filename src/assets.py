@@ -1,12 +1,64 @@
+import hashlib
+import json
 import os
 import pygame
 import shutil
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tkinter import filedialog
 from PIL import Image
 
+from atlas import MAX_BYTES as ATLAS_MAX_BYTES, TileAtlas
+from watcher import AssetWatcher
+
 
 IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+THUMB_SIZE = 64
+
+# Persistent index (name -> size/mtime/thumbnail file) and thumbnail cache,
+# both relative to assets_dir. Folders starting with "." are not scanned.
+# The index holds absolute paths and cache file names, so it lives in the
+# machine-local .cache folder next to the images it indexes.
+REGISTRY_FILE = os.path.join(".cache", "registry.json")
+THUMB_CACHE_DIR = os.path.join(".cache", "thumbs")
+# Longest side of the working copy that get_surface() decodes, by top-level
+# folder (category). Larger images are downscaled once at import into
+# WORK_CACHE_DIR; the originals on disk are never modified. None = no cap.
+MAX_DIMENSIONS = {"tokens": 512, "tiles": 256, "backgrounds": 4096}
+DEFAULT_MAX_DIMENSION = 1024
+WORK_CACHE_DIR = os.path.join(".cache", "work")
+
+# abspath -> [size, mtime_ns, "sha256:<hex>"] for campaign save/load
+CHECKSUM_FILE = os.path.join(".cache", "checksums.json")
+
+# Optional content-addressed store (AssetManager(use_store=True)): imported
+# files live once in .store/<hex[:2]>/<sha256 hex>, and aliases.json maps
+# asset names to "sha256:<hex>".
+STORE_DIR = ".store"
+STORE_ALIASES = os.path.join(STORE_DIR, "aliases.json")
+
+# Pillow releases the GIL while decoding, so a few threads scale well
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+
+# Default budget for decoded full-size surfaces (see AssetManager.get_surface)
+MEMORY_BUDGET_MB = 512
+
+
+def _sha256_of_file(path):
+    """
+    Return SHA256 checksum in format 'sha256:<hex>' or None on error.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return "sha256:" + h.hexdigest()
 
 
 class AssetManager:
@@ -15,34 +67,328 @@ class AssetManager:
 
     self.assets[name] = {
         "path": full_path,
-        "surface": pygame.Surface,
+        "surface": pygame.Surface or None (full size, see get_surface),
         "thumb": pygame.Surface (thumbnail),
+        "width": image_width, "height": image_height,
         "size": file_size_bytes,
         "last_modified": mtime_int,
         "date_added": int_timestamp (first time seen)
     }
 
-    Thumbnails are only rebuilt when the file changes on disk.
+    Thumbnails are only rebuilt when the file changes on disk; they are
+    also kept in assets/.cache/thumbs and indexed in assets/.cache/registry.json,
+    so later launches reuse them instead of downsampling again.
+    Images are decoded and downsampled on a thread pool (workers); only the
+    conversion to pygame surfaces happens on the calling thread.
+    progress(done, total, name) is called as each image finishes.
+
+    Full-size surfaces are loaded on first get_surface(name), or ahead of
+    time in the background with prefetch(names) + poll_prefetch().
+    When they exceed memory_budget_mb, the least recently used ones that are
+    not in use (see in_use) are dropped and reloaded on the next access;
+    mem_stats counts bytes resident, evictions and reloads.
+
+    watch() starts an AssetWatcher on assets_dir; poll_changes() then feeds
+    only the added/changed/removed files into apply_changes() instead of
+    rescanning the whole folder.
+
+    checksums(paths) hashes files for campaigns, caching the result per
+    (path, size, mtime_ns) in assets/.cache/checksums.json, so a file is only
+    read again after it changes.
+
+    Images larger than max_dimension(name) (per top-level folder, see
+    MAX_DIMENSIONS) get a downscaled working copy in assets/.cache/work when
+    they are first registered; get_surface() decodes that copy, and
+    width/height stay those of the original file.
+
+    With use_store=True, imports go to the content-addressed store: a file
+    that is already stored is not copied again, and all names (aliases) of
+    the same content share one metadata dict, so its full-size surface is
+    decoded once. Campaigns keep the checksum, so find_by_checksum() can
+    locate their assets on another machine.
     """
 
-    def __init__(self, assets_dir):
+    def __init__(
+        self,
+        assets_dir,
+        workers=DECODE_WORKERS,
+        progress=None,
+        memory_budget_mb=MEMORY_BUDGET_MB,
+        use_store=False,
+        max_dimensions=None,
+    ):
         self.assets_dir = os.path.abspath(assets_dir)
         os.makedirs(self.assets_dir, exist_ok=True)
         self.assets = {}
+        self.workers = workers
         self._placeholder_surface = None
-        self.refresh_assets()
+        self.registry_path = os.path.join(self.assets_dir, REGISTRY_FILE)
+        self.thumb_dir = os.path.join(self.assets_dir, THUMB_CACHE_DIR)
+        self.work_dir = os.path.join(self.assets_dir, WORK_CACHE_DIR)
+        self.max_dimensions = dict(MAX_DIMENSIONS, **(max_dimensions or {}))
+        self.registry = self._load_registry()
+        self.checksum_path = os.path.join(self.assets_dir, CHECKSUM_FILE)
+        self._checksums = self._load_checksums()
+        self._checksums_dirty = False
+        self.use_store = use_store
+        self.store_dir = os.path.join(self.assets_dir, STORE_DIR)
+        self.aliases = self._load_aliases() if use_store else {}
+        self._prefetch_pool = None
+        self._prefetching = {}  # name -> Future of _decode_full
 
-    def _load_surface(self, path):
+        # decoded full-size surfaces, least recently used first
+        self.memory_budget_mb = memory_budget_mb
+        self._resident = OrderedDict()  # name -> bytes
+        self._evicted = set()
+        self.mem_stats = {"bytes_resident": 0, "evictions": 0, "reloads": 0}
+        # callable returning the asset names (or file paths) currently used by
+        # tokens, tiles and the background; those are never evicted
+        self.in_use = None
+        self.watcher = None
+        # tile sprites packed for TileMap.render (see add_tile_sprite)
+        self.tile_atlas = self._new_tile_atlas()
+        self._atlas_metas = {}
+
+        self.refresh_assets(progress=progress)
+
+    @staticmethod
+    def _decode_full(path):
+        """Pillow-only full decode (thread-safe). Returns (size, rgba bytes) or None."""
         try:
-            img = Image.open(path).convert("RGBA")
-            mode = img.mode
-            size = img.size
-            data = img.tobytes()
-            return pygame.image.fromstring(data, size, mode).convert_alpha()
+            with Image.open(path) as im:
+                img = im.convert("RGBA")
+            return img.size, img.tobytes()
         except Exception as e:
             print("Failed load surface:", e)
             return None
 
+    @staticmethod
+    def _decode_thumb(path, thumb_dim=THUMB_SIZE, thumb_cache=None, work=None):
+        """
+        Pillow-only thumbnail load (safe to run on a worker thread).
+        Returns ((width, height), (thumb size, rgba bytes), work path or None)
+        or None. thumb_cache: thumbnail file to read if it exists (the image
+        itself is then only opened for its header), else to write.
+        work: (path, max_dim); if the image is larger than max_dim, a
+        downscaled working copy is written to path (once) and returned.
+        """
+        try:
+            with Image.open(path) as im:
+                dims = im.size
+                work_path = None
+                src = im
+                if work and work[1] and max(dims) > work[1]:
+                    work_path, max_dim = work
+                    if not os.path.exists(work_path):
+                        im.draft("RGB", (max_dim, max_dim))
+                        src = im.convert("RGBA")
+                        src.thumbnail((max_dim, max_dim), Image.LANCZOS)
+                        try:
+                            os.makedirs(os.path.dirname(work_path), exist_ok=True)
+                            src.save(work_path + ".tmp", "PNG", compress_level=1)
+                            os.replace(work_path + ".tmp", work_path)
+                        except OSError as e:
+                            print("[WARNING] Could not write working copy:", e)
+                            work_path = None
+
+                thumb = None
+                if thumb_cache and os.path.exists(thumb_cache):
+                    try:
+                        with Image.open(thumb_cache) as tim:
+                            thumb = tim.convert("RGBA")
+                    except OSError:
+                        thumb = None
+                if thumb is None:
+                    if src is im:
+                        im.draft("RGB", (thumb_dim, thumb_dim))  # JPEG: decode at reduced scale
+                    thumb = src.convert("RGBA")
+                    thumb.thumbnail((thumb_dim, thumb_dim), Image.LANCZOS)
+                    if thumb_cache:
+                        try:
+                            os.makedirs(os.path.dirname(thumb_cache), exist_ok=True)
+                            thumb.save(thumb_cache)
+                        except OSError as e:
+                            print("[WARNING] Could not cache thumbnail:", e)
+            return dims, (thumb.size, thumb.tobytes()), work_path
+        except Exception as e:
+            print("Failed load surface:", e)
+            return None
+
+    @staticmethod
+    def _to_surface(size, data):
+        return pygame.image.fromstring(data, size, "RGBA").convert_alpha()
+
+    def _load_surface(self, path):
+        decoded = self._decode_full(path)
+        if decoded is None:
+            return None
+        return self._to_surface(*decoded)
+
+    # ------------------------------------------------------------------
+    # FULL-SIZE SURFACES (lazy)
+    # ------------------------------------------------------------------
+
+    def get_surface(self, name):
+        """
+        Full-size surface of asset `name`, decoding it on first use.
+        Returns None for unknown or unreadable assets.
+        """
+        meta = self.assets.get(name)
+        if not meta:
+            return None
+        surf = meta.get("surface")
+        if surf is not None:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+            return surf
+
+        fut = self._prefetching.pop(name, None)
+        decoded = fut.result() if fut is not None else self._decode_full(self._surface_path(meta))
+        if decoded is None:
+            return None
+        surf = self._to_surface(*decoded)
+        meta["surface"] = surf
+
+        if name in self._evicted:
+            self._evicted.discard(name)
+            self.mem_stats["reloads"] += 1
+        nbytes = surf.get_pitch() * surf.get_height()
+        self._resident[name] = nbytes
+        self.mem_stats["bytes_resident"] += nbytes
+        self._enforce_budget(keep=name)
+        return surf
+
+    @staticmethod
+    def _surface_path(meta):
+        # downscaled working copy if the original exceeds its category cap
+        work = meta.get("work")
+        return work if work and os.path.exists(work) else meta.get("path")
+
+    def source_scale(self, name):
+        """
+        Original image pixels per surface pixel (> 1 when get_surface returns
+        a downscaled working copy); tokens multiply their scale by it so they
+        keep their size on the board.
+        """
+        meta = self.assets.get(name)
+        surf = meta.get("surface") if meta else None
+        if surf is None or not meta.get("width") or not surf.get_width():
+            return 1.0
+        return meta["width"] / float(surf.get_width())
+
+    def _new_tile_atlas(self):
+        # the atlas pages take up to a quarter of the memory budget; sprites
+        # are fetched through get_surface, so they count towards it and can
+        # be evicted once packed
+        max_bytes = ATLAS_MAX_BYTES
+        if self.memory_budget_mb is not None:
+            max_bytes = min(max_bytes, self.memory_budget_mb * 1024 * 1024 // 4)
+        return TileAtlas(max_bytes=max_bytes, loader=self.get_surface)
+
+    def add_tile_sprite(self, name):
+        """
+        Put asset `name` into tile_atlas; returns its index, or None if the
+        asset is missing or still being prefetched (try again next frame).
+        """
+        idx = self.tile_atlas.index.get(name)
+        if idx is not None:
+            return idx
+        surf = self.surface_if_ready(name)
+        if surf is None:
+            return None
+        self._atlas_metas[name] = self.assets.get(name)
+        return self.tile_atlas.add(name, surf)
+
+    def _enforce_budget(self, keep=None):
+        """Drop least recently used surfaces that nothing uses until under budget."""
+        if self.memory_budget_mb is None:
+            return
+        budget = self.memory_budget_mb * 1024 * 1024
+        if self.mem_stats["bytes_resident"] <= budget:
+            return
+        used = set(self.in_use()) if self.in_use else set()
+        for name in list(self._resident):
+            if self.mem_stats["bytes_resident"] <= budget:
+                break
+            meta = self.assets.get(name)
+            if name == keep or name in used or (meta and meta.get("path") in used):
+                continue
+            self._release(name)
+            self._evicted.add(name)
+            self.mem_stats["evictions"] += 1
+
+    def _release(self, name):
+        nbytes = self._resident.pop(name, 0)
+        self.mem_stats["bytes_resident"] -= nbytes
+        meta = self.assets.get(name)
+        if meta is not None and meta.get("path"):
+            meta["surface"] = None
+
+    def prefetch(self, names):
+        """
+        Start decoding the full surfaces of `names` in the background, in
+        that order (the pool works through submissions first come first
+        served, so put what the camera shows first).
+        """
+        for name in names:
+            meta = self.assets.get(name)
+            if not meta or meta.get("surface") is not None or name in self._prefetching:
+                continue
+            if not meta.get("path"):
+                continue
+            self._prefetching[name] = self.decode_async(self._surface_path(meta))
+
+    def decode_async(self, path):
+        """Future of _decode_full(path) on the prefetch pool."""
+        if self._prefetch_pool is None:
+            self._prefetch_pool = ThreadPoolExecutor(max_workers=max(1, self.workers))
+        return self._prefetch_pool.submit(self._decode_full, path)
+
+    def surface_if_ready(self, name):
+        """
+        Like get_surface, but returns None instead of waiting while the
+        asset is still being prefetched.
+        """
+        meta = self.assets.get(name)
+        if not meta:
+            return None
+        fut = self._prefetching.get(name)
+        if meta.get("surface") is None and fut is not None and not fut.done():
+            return None
+        return self.get_surface(name)
+
+    def is_prefetching(self, name):
+        return name in self._prefetching
+
+    def preview_surface(self, name):
+        """
+        Thumbnail scaled up to the size get_surface(name) will return, to
+        stand in for the asset until it is decoded.
+        """
+        meta = self.assets.get(name)
+        if not meta or meta.get("thumb") is None:
+            return None
+        w, h = meta.get("width") or 0, meta.get("height") or 0
+        cap = self.max_dimension(name) if meta.get("work") else None
+        if cap and max(w, h) > cap:
+            f = cap / float(max(w, h))
+            w, h = int(w * f), int(h * f)
+        if w <= 0 or h <= 0:
+            return meta["thumb"]
+        try:
+            return pygame.transform.smoothscale(meta["thumb"], (w, h))
+        except Exception:
+            return pygame.transform.scale(meta["thumb"], (w, h))
+
+    def poll_prefetch(self, limit=4):
+        """
+        Turn up to `limit` finished prefetches into surfaces (main thread,
+        once per frame). Returns the number still pending.
+        """
+        for name in [n for n, f in self._prefetching.items() if f.done()][:limit]:
+            self.get_surface(name)
+        return len(self._prefetching)
+
     def _make_thumb(self, surface, max_dim=64):
         w = surface.get_width()
         h = surface.get_height()
@@ -57,66 +403,440 @@ class AssetManager:
             thumb = pygame.transform.scale(surface, (tw, th))
         return thumb
 
-    def refresh_assets(self):
+    def refresh_assets(self, progress=None):
         """
         Rescan the assets directory (including subfolders) and rebuild metadata.
         Existing cached surfaces/thumbnails are reused if file path + mtime match.
+        With use_store, store aliases are listed after the files on disk.
+        Assets registered from files outside assets_dir are kept.
         """
         old = self.assets
         new_assets = {}
+        to_load = []  # (name, full, thumb_cache, work, (size, mtime, entry))
+        order = []
+        registry = {}
+        first_by_path = {}  # store blob -> first alias (aliases share one meta)
+
+        files = []
+        for root, dirs, fns in os.walk(self.assets_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for fn in fns:
+                if fn.lower().endswith(IMAGE_EXTS):
+                    full = os.path.join(root, fn)
+                    rel = os.path.relpath(full, self.assets_dir)
+                    files.append((rel.replace("\\", "/"), full))
+        if self.use_store:
+            on_disk = {name for name, _ in files}
+            for name, digest in self.aliases.items():
+                if name not in on_disk:
+                    files.append((name, self._blob_path(digest)))
+
+        for name, full in files:
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            mtime = int(st.st_mtime)
+            size = st.st_size
+            order.append(name)
+
+            entry = self._registry_entry(name, full, st)
+            registry[name] = entry
+
+            if first_by_path.setdefault(full, name) != name:
+                continue  # another alias of the same content
+
+            prev = old.get(name)
+            if (
+                prev
+                and prev.get("path") == full
+                and prev.get("last_modified") == mtime
+                and prev.get("thumb") is not None
+            ):
+                new_assets[name] = prev
+                continue
+
+            to_load.append((name, full, *self._cache_files(entry), (size, mtime, entry)))
 
-        for root, _, files in os.walk(self.assets_dir):
-            for fn in files:
-                if not fn.lower().endswith(IMAGE_EXTS):
-                    continue
-                full = os.path.join(root, fn)
-                rel = os.path.relpath(full, self.assets_dir)
-                name = rel.replace("\\", "/")
-
-                try:
-                    mtime = int(os.path.getmtime(full))
-                    size = os.path.getsize(full)
-                except OSError:
-                    continue
-
-                prev = old.get(name)
-                if (
-                    prev
-                    and prev.get("path") == full
-                    and prev.get("last_modified") == mtime
-                    and "surface" in prev
-                    and "thumb" in prev
-                ):
-                    new_assets[name] = prev
-                    continue
-
-                surf = self._load_surface(full)
-                if not surf:
-                    continue
-                thumb = self._make_thumb(surf)
-                new_assets[name] = {
-                    "path": full,
-                    "surface": surf,
-                    "thumb": thumb,
-                    "size": size,
-                    "last_modified": mtime,
-                    "date_added": prev.get("date_added", mtime) if prev else mtime,
-                }
-
-        self.assets = new_assets
+        for (name, full, _, _, (size, mtime, entry)), decoded in self._decode_all(
+            to_load, progress
+        ):
+            if decoded is not None:
+                new_assets[name] = self._asset_meta(full, decoded, size, mtime, entry)
+
+        for name, full in files:
+            first = first_by_path.get(full)
+            if first != name and first in new_assets:
+                new_assets[name] = new_assets[first]
+
+        # keep directory order regardless of decode completion order
+        self.assets = {name: new_assets[name] for name in order if name in new_assets}
+        # files a campaign registered from outside the library (ensure_asset)
+        # are not on the scan, but stay loaded while they exist
+        inside = self.assets_dir + os.sep
+        for name, meta in old.items():
+            path = meta.get("path") or ""
+            if (
+                name not in self.assets
+                and path
+                and not os.path.abspath(path).startswith(inside)
+                and os.path.exists(path)
+            ):
+                self.assets[name] = meta
+        self._update_registry(registry)
+        self._drop_stale(old)
+
+    def apply_changes(self, added=(), changed=(), removed=()):
+        """
+        Incremental refresh_assets: update only the given names (relative to
+        assets_dir, "/"-separated). Files whose registry entry already matches
+        their size/mtime are skipped. Returns the names whose metadata changed.
+        """
+        old = dict(self.assets)
+        registry = dict(self.registry)
+        touched = []
+        to_load = []
+
+        for name in removed:
+            registry.pop(name, None)
+            if self.assets.pop(name, None) is not None:
+                touched.append(name)
+
+        for name in list(added) + list(changed):
+            full = os.path.join(self.assets_dir, *name.split("/"))
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            prev = registry.get(name) or {}
+            if (
+                name in self.assets
+                and prev.get("size") == st.st_size
+                and prev.get("mtime_ns") == st.st_mtime_ns
+            ):
+                continue
+            entry = self._registry_entry(name, full, st)
+            registry[name] = entry
+            to_load.append(
+                (name, full, *self._cache_files(entry), (st.st_size, int(st.st_mtime), entry))
+            )
+
+        for (name, full, _, _, (size, mtime, entry)), decoded in self._decode_all(to_load):
+            if decoded is not None:
+                self.assets[name] = self._asset_meta(full, decoded, size, mtime, entry)
+                touched.append(name)
+
+        self._update_registry(registry)
+        self._drop_stale(old)
+        return touched
+
+    def watch(self, **kwargs):
+        """Start watching assets_dir (kwargs go to AssetWatcher)."""
+        if self.watcher is None:
+            self.watcher = AssetWatcher(self.assets_dir, IMAGE_EXTS, **kwargs)
+        return self.watcher
+
+    def poll_changes(self):
+        """
+        Apply what the watcher saw since the last call; cheap enough to call
+        every frame. Returns (added, changed, removed).
+        """
+        if self.watcher is None:
+            return [], [], []
+        added, changed, removed = self.watcher.poll()
+        if added or changed or removed:
+            self.apply_changes(added, changed, removed)
+        return added, changed, removed
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        if self._prefetch_pool is not None:
+            self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+            self._prefetch_pool = None
+
+    def _asset_meta(self, full, decoded, size, mtime, entry):
+        return {
+            "path": full,
+            "surface": None,
+            "thumb": self._to_surface(*decoded[1]),
+            "work": decoded[2],
+            "width": decoded[0][0],
+            "height": decoded[0][1],
+            "size": size,
+            "last_modified": mtime,
+            "date_added": entry["date_added"],
+        }
+
+    def _drop_stale(self, old):
+        """Forget surfaces / prefetches of files that changed or disappeared."""
+        for name in list(self._resident):
+            if self.assets.get(name) is not old.get(name):
+                self.mem_stats["bytes_resident"] -= self._resident.pop(name)
+                self._evicted.discard(name)
+        for name in list(self._prefetching):
+            if self.assets.get(name) is not old.get(name):
+                self._prefetching.pop(name).cancel()
+        if any(self.assets.get(n) is not m for n, m in self._atlas_metas.items()):
+            self.tile_atlas = self._new_tile_atlas()
+            self._atlas_metas = {}
+
+    def _decode_all(self, jobs, progress=None):
+        """
+        Yield (job, decoded) as images finish; jobs are
+        (name, path, thumb_cache, work, extra).
+        """
+        total = len(jobs)
+        if self.workers <= 1 or total <= 1:
+            for i, job in enumerate(jobs):
+                decoded = self._decode_thumb(job[1], THUMB_SIZE, job[2], job[3])
+                if progress:
+                    progress(i + 1, total, job[0])
+                yield job, decoded
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                pool.submit(self._decode_thumb, job[1], THUMB_SIZE, job[2], job[3]): job
+                for job in jobs
+            }
+            for i, fut in enumerate(as_completed(futures)):
+                job = futures[fut]
+                if progress:
+                    progress(i + 1, total, job[0])
+                yield job, fut.result()
+
+    # ------------------------------------------------------------------
+    # REGISTRY / THUMBNAIL CACHE
+    # ------------------------------------------------------------------
+
+    def _load_registry(self):
+        try:
+            with open(self.registry_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _registry_entry(self, name, full, st):
+        """
+        Registry entry for an asset file. The thumbnail and working copy
+        file names hash (name, size, mtime, THUMB_SIZE / max dimension), so
+        an edited file never matches its old cached images.
+        """
+        key = f"{name}|{st.st_size}|{st.st_mtime_ns}"
+        max_dim = self.max_dimension(name)
+        thumb = hashlib.sha1(f"{key}|{THUMB_SIZE}".encode("utf-8")).hexdigest() + ".png"
+        work = hashlib.sha1(f"{key}|{max_dim}".encode("utf-8")).hexdigest() + ".png"
+        prev = self.registry.get(name) or {}
+        return {
+            "path": full,
+            "size": st.st_size,
+            "date_added": prev.get("date_added", st.st_mtime),
+            "mtime_ns": st.st_mtime_ns,
+            "thumb": thumb,
+            "work": work if max_dim else None,
+            "max_dim": max_dim,
+        }
+
+    def _cache_files(self, entry):
+        """(thumb_cache, work) arguments of _decode_thumb for a registry entry."""
+        thumb_cache = os.path.join(self.thumb_dir, entry["thumb"])
+        if not entry.get("work"):
+            return thumb_cache, None
+        return thumb_cache, (os.path.join(self.work_dir, entry["work"]), entry["max_dim"])
+
+    def max_dimension(self, name):
+        """Working copy size cap for asset `name` (by top-level folder)."""
+        return self.max_dimensions.get(self.category(name).lower(), DEFAULT_MAX_DIMENSION)
+
+    def _update_registry(self, registry):
+        """Save the registry if it changed and delete stale cached images."""
+        if registry == self.registry:
+            return
+        for key, folder in (("thumb", self.thumb_dir), ("work", self.work_dir)):
+            keep = {e.get(key) for e in registry.values()}
+            for entry in self.registry.values():
+                old = entry.get(key)
+                if old and old not in keep:
+                    try:
+                        os.remove(os.path.join(folder, old))
+                    except OSError:
+                        pass
+        self.registry = registry
+        tmp = self.registry_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.registry_path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(registry, f, indent=2)
+            os.replace(tmp, self.registry_path)
+        except OSError as e:
+            print("[WARNING] Could not save asset registry:", e)
+
+    # ------------------------------------------------------------------
+    # CHECKSUM CACHE
+    # ------------------------------------------------------------------
+
+    def _load_checksums(self):
+        try:
+            with open(self.checksum_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def checksums(self, paths):
+        """
+        {path: 'sha256:<hex>' or None}. Files whose size and mtime match the
+        cache are not read; the others are hashed on the decode thread pool.
+        """
+        out = {}
+        stale = []  # (path, key, st)
+        for path in paths:
+            if not path or path in out:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                out[path] = None
+                continue
+            key = os.path.abspath(path)
+            hit = self._checksums.get(key)
+            if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+                out[path] = hit[2]
+            else:
+                out[path] = None
+                stale.append((path, key, st))
+
+        if stale:
+            if self.workers <= 1 or len(stale) == 1:
+                digests = [_sha256_of_file(p) for p, _, _ in stale]
+            else:
+                with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                    digests = list(pool.map(_sha256_of_file, [p for p, _, _ in stale]))
+            for (path, key, st), digest in zip(stale, digests):
+                out[path] = digest
+                if digest:
+                    self._checksums[key] = [st.st_size, st.st_mtime_ns, digest]
+                    self._checksums_dirty = True
+        return out
+
+    def checksum(self, path):
+        return self.checksums([path]).get(path)
+
+    def save_checksums(self):
+        """Write the checksum cache if it changed, dropping deleted files."""
+        if not self._checksums_dirty:
+            return
+        self._checksums = {k: v for k, v in self._checksums.items() if os.path.exists(k)}
+        tmp = self.checksum_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.checksum_path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._checksums, f)
+            os.replace(tmp, self.checksum_path)
+            self._checksums_dirty = False
+        except OSError as e:
+            print("[WARNING] Could not save checksum cache:", e)
+
+    # ------------------------------------------------------------------
+    # CONTENT-ADDRESSED STORE
+    # ------------------------------------------------------------------
+
+    def _load_aliases(self):
+        try:
+            with open(os.path.join(self.assets_dir, STORE_ALIASES), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_aliases(self):
+        path = os.path.join(self.assets_dir, STORE_ALIASES)
+        tmp = path + ".tmp"
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.aliases, f, indent=2, sort_keys=True)
+            os.replace(tmp, path)
+        except OSError as e:
+            print("[WARNING] Could not save store aliases:", e)
+
+    def _blob_path(self, digest):
+        hexdigest = digest.split(":", 1)[-1]
+        return os.path.join(self.store_dir, hexdigest[:2], hexdigest)
+
+    def add_to_store(self, path, name=None):
+        """
+        Copy `path` into the store (only if that content is new) and register
+        it under `name` (default: file name). Returns the asset name, which is
+        an existing alias when the same file was imported under that name.
+        """
+        digest = self.checksum(path)
+        if not digest:
+            return None
+        blob = self._blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            shutil.copyfile(path, blob + ".tmp")
+            os.replace(blob + ".tmp", blob)
+
+        name = name or os.path.basename(path)
+        if self.aliases.get(name) != digest:
+            base, ext = os.path.splitext(name)
+            i = 1
+            while name in self.aliases or name in self.assets:
+                name = f"{base}_{i}{ext}"
+                i += 1
+            self.aliases[name] = digest
+            self._save_aliases()
+
+        for other in self.assets:
+            if self.aliases.get(other) == digest and other != name:
+                self.assets[name] = self.assets[other]
+                return name
+        return name if self.ensure_asset(name, blob) else None
+
+    def find_by_checksum(self, digest, name=None):
+        """
+        Local file with content `digest` ('sha256:<hex>'): the store blob if
+        present, otherwise a file whose cached checksum matches, otherwise a
+        library asset with that content (library files not in the cache are
+        hashed once and cached). Failing that, the library asset called
+        `name`, if any -- the caller still sees the checksum mismatch.
+        """
+        if digest:
+            if self.use_store:
+                blob = self._blob_path(digest)
+                if os.path.exists(blob):
+                    return blob
+            for key, (_, _, known) in self._checksums.items():
+                if known == digest and os.path.exists(key):
+                    return key
+            sums = self.checksums([meta.get("path", "") for meta in self.assets.values()])
+            for path, known in sums.items():
+                if known == digest:
+                    return path
+        meta = self.assets.get(name) if name else None
+        if meta and meta.get("path") and os.path.exists(meta["path"]):
+            return meta["path"]
+        return None
+
+    @staticmethod
+    def category(name):
+        """Top-level folder of an asset name ("monsters/orc.png" -> "monsters")."""
+        return name.split("/")[0] if "/" in name else ""
 
     def get_categories(self):
         """
-        Return a sorted list of top-level subfolder names under assets_dir
-        present in current assets.
+        Return a sorted list of the categories (top-level folders of the
+        asset names) present in current assets. Names, not file paths, so
+        store blobs under .store/ and campaign files outside assets_dir
+        don't show up as folders.
         """
-        cats = set()
-        for meta in self.assets.values():
-            rel = os.path.relpath(meta["path"], self.assets_dir)
-            rel_dir = os.path.dirname(rel)
-            if rel_dir and rel_dir != ".":
-                top = rel_dir.replace("\\", "/").split("/")[0]
-                cats.add(top)
+        cats = {self.category(name) for name in self.assets}
+        cats.discard("")
         return sorted(cats)
 
     def import_asset_dialog(self):
@@ -130,6 +850,10 @@ class AssetManager:
         if not fp:
             return None
         try:
+            if self.use_store:
+                name = self.add_to_store(fp)
+                print("Imported", name)
+                return self.assets[name]["path"] if name in self.assets else None
             base = os.path.basename(fp)
             dest = os.path.join(self.assets_dir, base)
             if os.path.exists(dest):
@@ -170,20 +894,59 @@ class AssetManager:
                 "path": "",
                 "surface": self._placeholder_surface,
                 "thumb": self._make_thumb(self._placeholder_surface),
+                "width": surf.get_width(),
+                "height": surf.get_height(),
                 "size": 0,
                 "last_modified": 0,
                 "date_added": 0,
             }
         return self._placeholder_surface
 
+    def ensure_asset(self, name, path):
+        """
+        Register asset 'name' for 'path' without decoding the full image
+        (thumbnail + size only; get_surface() loads it later).
+        Returns True if the asset is available.
+        """
+        meta = self.assets.get(name)
+        if meta and meta.get("path") == path:
+            return True
+        try:
+            _, work = self._cache_files(self._registry_entry(name, path, os.stat(path)))
+        except OSError:
+            work = None
+        decoded = self._decode_thumb(path, THUMB_SIZE, None, work)
+        if decoded is None:
+            return False
+        try:
+            mtime = int(os.path.getmtime(path))
+            size = os.path.getsize(path)
+        except OSError:
+            mtime = 0
+            size = 0
+        self.assets[name] = {
+            "path": path,
+            "surface": None,
+            "thumb": self._to_surface(*decoded[1]),
+            "work": decoded[2],
+            "width": decoded[0][0],
+            "height": decoded[0][1],
+            "size": size,
+            "last_modified": mtime,
+            "date_added": mtime,
+        }
+        return True
+
     def load_or_get_asset(self, name, path):
         """
         Ensure an asset 'name' for 'path' is loaded and registered.
         Returns surface or None.
         """
         meta = self.assets.get(name)
-        if meta and meta.get("path") == path and "surface" in meta:
-            return meta["surface"]
+        if meta and meta.get("path") == path:
+            surf = self.get_surface(name)
+            if surf is not None:
+                return surf
 
         surf = self._load_surface(path)
         if not surf:
@@ -199,6 +962,8 @@ class AssetManager:
             "path": path,
             "surface": surf,
             "thumb": thumb,
+            "width": surf.get_width(),
+            "height": surf.get_height(),
             "size": size,
             "last_modified": mtime,
             "date_added": mtime,
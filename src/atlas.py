@@ -0,0 +1,117 @@
+from collections import OrderedDict
+
+import pygame
+
+
+# ----------------------------------------------------------------------
+# TILE SPRITE ATLAS
+#
+# Sprites get an integer index on add(); cells(size) returns, per index,
+# (page surface, area rect) with every sprite pre-scaled to size x size
+# and packed row by row into a few page surfaces, so a whole tile layer
+# is drawn with Surface.blits() from a handful of sources.
+# One packing is kept per cell size (zoom level); the least recently used
+# are dropped first once there are more than max_buckets of them or their
+# pages take more than max_bytes (the size being drawn is always kept).
+# With a loader(name) -> surface, source surfaces are only held until
+# they are packed and are fetched again for the next zoom level, so the
+# asset manager's memory budget decides whether they stay decoded.
+# ----------------------------------------------------------------------
+
+PAGE_SIZE = 2048
+MAX_BUCKETS = 4
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class TileAtlas:
+    def __init__(
+        self, page_size=PAGE_SIZE, max_buckets=MAX_BUCKETS, max_bytes=MAX_BYTES, loader=None
+    ):
+        self.page_size = page_size
+        self.max_buckets = max_buckets
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.index = {}  # sprite name -> int
+        self.names = []  # int -> sprite name
+        self._sources = {}  # int -> surface not packed yet (every one without a loader)
+        self._buckets = OrderedDict()  # cell size -> [(page, rect), ...]
+        self._bucket_bytes = {}  # cell size -> bytes of its pages
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, surface):
+        """Register a sprite (idempotent) and return its index."""
+        idx = self.index.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.index[name] = idx
+            self.names.append(name)
+            self._sources[idx] = surface
+        return idx
+
+    def cells(self, size):
+        """[(page, rect)] by sprite index, sprites scaled to size x size."""
+        size = max(1, int(size))
+        cells = self._buckets.get(size)
+        if cells is None:
+            cells = []
+            self._buckets[size] = cells
+            self._bucket_bytes[size] = 0
+        else:
+            self._buckets.move_to_end(size)
+        if len(cells) < len(self.names):
+            self._pack(size, cells)
+            if self.loader is not None:
+                self._sources.clear()
+        self._evict(keep=size)
+        return cells
+
+    def _evict(self, keep):
+        while len(self._buckets) > 1 and (
+            len(self._buckets) > self.max_buckets
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            size = next(iter(self._buckets))
+            if size == keep:
+                break
+            del self._buckets[size]
+            self.bytes -= self._bucket_bytes.pop(size)
+
+    def _source(self, idx):
+        surf = self._sources.get(idx)
+        if surf is None and self.loader is not None:
+            surf = self.loader(self.names[idx])
+        return surf
+
+    def _pack(self, size, cells):
+        # every cell has the same size, so packing is a plain grid; sprites
+        # added since the last call go onto new pages
+        per_row = max(1, self.page_size // size)
+        todo = list(range(len(cells), len(self.names)))
+        while todo:
+            batch = todo[: per_row * per_row]
+            todo = todo[len(batch) :]
+            cols = min(per_row, len(batch))
+            rows = (len(batch) + per_row - 1) // per_row
+            page = pygame.Surface((cols * size, rows * size), pygame.SRCALPHA)
+            rects = []
+            for i, idx in enumerate(batch):
+                rect = pygame.Rect((i % per_row) * size, (i // per_row) * size, size, size)
+                src = self._source(idx)
+                if src is not None:  # asset gone: the cell stays transparent
+                    try:
+                        img = pygame.transform.smoothscale(src, (size, size))
+                    except Exception:
+                        img = pygame.transform.scale(src, (size, size))
+                    page.blit(img, rect)
+                rects.append(rect)
+            try:
+                page = page.convert_alpha()
+            except pygame.error:
+                pass  # no display mode yet
+            nbytes = page.get_pitch() * page.get_height()
+            self._bucket_bytes[size] += nbytes
+            self.bytes += nbytes
+            cells.extend((page, rect) for rect in rects)
@@ -0,0 +1,320 @@
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+import dice
+from assets import AssetManager
+from atlas import TileAtlas
+from rules import RulesEngine
+from tilemap import TileMap
+from tokens import TokenManager
+
+
+WIDTH, HEIGHT = 1280, 720
+BOARD_RECT = pygame.Rect(0, 58, WIDTH, HEIGHT - 58)
+
+
+class BenchAssets:
+    """
+    Minimal stand-in for AssetManager: a few generated token sprites,
+    so benchmarks do not depend on the contents of assets/.
+    """
+
+    def __init__(self, count=4, size=64):
+        self.assets = {}
+        for i in range(count):
+            surf = pygame.Surface((size, size), pygame.SRCALPHA)
+            col = (60 + 40 * i, 200 - 30 * i, 120, 255)
+            pygame.draw.circle(surf, col, (size // 2, size // 2), size // 2 - 2)
+            self.assets[f"bench_{i}.png"] = {"path": "", "surface": surf, "thumb": surf}
+        self.tile_atlas = TileAtlas()
+
+    def get_surface(self, name):
+        meta = self.assets.get(name)
+        return meta["surface"] if meta else None
+
+    def source_scale(self, name):
+        return 1.0
+
+    # tile sprites, same interface as AssetManager
+    def add_tile_sprite(self, name):
+        surf = self.get_surface(name)
+        return self.tile_atlas.add(name, surf) if surf is not None else None
+
+
+def _spawn_grid(token_mgr, count, spacing=80):
+    names = list(token_mgr.asset_manager.assets.keys())
+    cols = max(1, int(count ** 0.5 * 1.25))
+    tokens = []
+    for i in range(count):
+        t = token_mgr.spawn_token(names[i % len(names)], (i % cols) * spacing, (i // cols) * spacing)
+        if i % 3 == 0:
+            t.border_style = "dotted"
+        elif i % 3 == 1:
+            t.border_style = "solid"
+        t.locked = i % 5 == 0
+        tokens.append(t)
+    return tokens
+
+
+def _time_frames(fn, frames):
+    fn()  # warm caches
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn()
+    return (time.perf_counter() - start) / frames * 1000.0
+
+
+# ---------------------------------------------------------------------- #
+# Benchmarks
+# ---------------------------------------------------------------------- #
+
+
+def bench_lod(args):
+    """Frame time of TokenManager.draw at low zoom with and without LOD."""
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    token_mgr = TokenManager(BenchAssets())
+    _spawn_grid(token_mgr, args.tokens)
+
+    def frame():
+        screen.fill((40, 40, 45))
+        token_mgr.draw(screen, 0.0, 0.0, args.zoom, BOARD_RECT, 64, True)
+
+    lod_policy = dict(token_mgr.lod_policy)
+    token_mgr.lod_policy = {"impostor": 0.0, "dot": 0.0, "decorations": 0.0}
+    full_ms = _time_frames(frame, args.frames)
+    token_mgr.lod_policy = lod_policy
+    lod_ms = _time_frames(frame, args.frames)
+
+    print(f"tokens={args.tokens} zoom={args.zoom} drawn={token_mgr.draw_stats['drawn']}")
+    print(f"  full detail : {full_ms:8.2f} ms/frame")
+    print(f"  LOD policy  : {lod_ms:8.2f} ms/frame")
+
+
+def bench_select(args):
+    """Redraw cost with a large selection (regression check for _is_selected)."""
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    token_mgr = TokenManager(BenchAssets())
+    tokens = _spawn_grid(token_mgr, args.tokens)
+
+    def frame():
+        screen.fill((40, 40, 45))
+        token_mgr.draw(screen, 0.0, 0.0, args.zoom, BOARD_RECT, 64, True)
+
+    token_mgr._set_selection([])
+    none_ms = _time_frames(frame, args.frames)
+
+    start = time.perf_counter()
+    token_mgr._set_selection(tokens[: args.selected])
+    token_mgr._group_selected()
+    group_ms = (time.perf_counter() - start) * 1000.0
+    sel_ms = _time_frames(frame, args.frames)
+
+    start = time.perf_counter()
+    for t in tokens[: args.selected]:
+        token_mgr._tokens_in_group(t.group_id)
+    lookup_ms = (time.perf_counter() - start) * 1000.0
+
+    print(f"tokens={args.tokens} selected={args.selected} zoom={args.zoom}")
+    print(f"  draw, nothing selected : {none_ms:8.2f} ms/frame")
+    print(f"  draw, {args.selected} selected    : {sel_ms:8.2f} ms/frame")
+    print(f"  select + group         : {group_ms:8.2f} ms")
+    print(f"  {args.selected} group lookups     : {lookup_ms:8.2f} ms")
+
+
+# A pure onTurn script with some arithmetic per token
+TURN_SCRIPT = "\n".join(
+    [
+        "regen = roll(6) + roll(6) + roll(4)",
+        "drift = (roll(20) - 10) * 0.5",
+        "if hp < max_hp * 0.5 then",
+        "    heal(regen)",
+        "else",
+        "    damage(roll(4) - 1)",
+        "end",
+        "move(drift, -drift)",
+    ]
+    + [f"w{i} = (hp * {i + 1} + x * y) % 97 + roll(100) ** 2" for i in range(24)]
+)
+
+
+def bench_scripts(args):
+    """Global onTurn over many tokens: run_event loop, batch and process pool."""
+    token_mgr = TokenManager(BenchAssets())
+    tokens = _spawn_grid(token_mgr, args.tokens)
+    engine = RulesEngine()
+    engine.set_global_script("onTurn", TURN_SCRIPT)
+
+    start = time.perf_counter()
+    for t in tokens:
+        engine.run_event("onTurn", t)
+    serial_ms = (time.perf_counter() - start) * 1000.0
+    engine.event_queue.clear()
+
+    start = time.perf_counter()
+    engine.run_event_batch("onTurn", tokens)
+    batch_ms = (time.perf_counter() - start) * 1000.0
+    engine.event_queue.clear()
+
+    print(f"tokens={args.tokens} cpus={multiprocessing.cpu_count()}")
+    print(f"  serial run_event        : {serial_ms:8.1f} ms")
+    print(f"  run_event_batch         : {batch_ms:8.1f} ms")
+    workers = 1
+    while workers <= args.workers:
+        engine.run_event_parallel("onTurn", tokens[:workers], workers=workers)  # spawn pool
+        start = time.perf_counter()
+        engine.run_event_parallel("onTurn", tokens, workers=workers)
+        par_ms = (time.perf_counter() - start) * 1000.0
+        engine.event_queue.clear()
+        print(f"  parallel, {workers:2d} workers    : {par_ms:8.1f} ms  (x{serial_ms / par_ms:.2f})")
+        workers *= 2
+    engine.close()
+
+
+def bench_dice(args):
+    """Mass rolling (Python loop vs roll_many) and exact 10d10 odds."""
+    n = args.dice
+
+    start = time.perf_counter()
+    total = sum(random.randint(1, 6) for _ in range(n))
+    loop_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    rolled = dice.roll_many("1d6", n, seed=1)
+    many_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    kh = dice.roll_many("4d6kh3", n // 4, seed=1)
+    kh_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    dist = dice.distribution("10d10")
+    dist_ms = (time.perf_counter() - start) * 1000.0
+    stats = dice.summarize(dist)
+
+    print(f"dice={n} numpy={'yes' if dice.np is not None else 'no'}")
+    print(f"  randint loop, 1d6     : {loop_ms:8.1f} ms  (mean {total / n:.3f})")
+    print(f"  roll_many 1d6         : {many_ms:8.1f} ms  (mean {sum(rolled) / n:.3f})")
+    print(f"  roll_many 4d6kh3 (n/4): {kh_ms:8.1f} ms  (mean {sum(kh) / len(kh):.3f})")
+    print(f"  distribution 10d10    : {dist_ms:8.1f} ms  (mean {stats['mean']:.2f}, P(55) {dist[55]:.4f})")
+
+
+def bench_tiles(args):
+    """TileMap.render: per-tile smoothscale (old path) vs atlas blits."""
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    assets = BenchAssets(count=4, size=128)
+    names = list(assets.assets)
+    tilemap = TileMap(200, 200, 64)
+    for ty in range(200):
+        for tx in range(200):
+            tilemap.set_tile(tx, ty, "floor", names[(tx * 7 + ty * 3) % len(names)])
+
+    def per_tile_scale():
+        # the pre-atlas render loop: one smoothscale + blit per visible tile
+        screen.fill((40, 40, 45))
+        size = int(64 * args.zoom)
+        right = BOARD_RECT.w / args.zoom
+        bottom = BOARD_RECT.h / args.zoom
+        for (tx, ty), tile in tilemap.tiles.items():
+            if tx * 64 > right or ty * 64 > bottom:
+                continue
+            img = pygame.transform.smoothscale(assets.get_surface(tile.sprite), (size, size))
+            screen.blit(img, (int(tx * 64 * args.zoom), int(ty * 64 * args.zoom) + BOARD_RECT.y))
+
+    def atlas():
+        screen.fill((40, 40, 45))
+        tilemap.render(screen, assets, 0.0, 0.0, args.zoom, BOARD_RECT)
+
+    old_ms = _time_frames(per_tile_scale, args.frames)
+    atlas_ms = _time_frames(atlas, args.frames)
+
+    print(f"tiles={len(tilemap.tiles)} zoom={args.zoom} sprites={len(names)}")
+    print(f"  per-tile smoothscale : {old_ms:8.2f} ms/frame")
+    print(f"  atlas blits          : {atlas_ms:8.2f} ms/frame  (x{old_ms / atlas_ms:.1f})")
+
+
+def _make_image_library(path, count, size=512):
+    """count noisy RGBA PNGs (noise keeps decode cost realistic)."""
+    from PIL import Image
+
+    os.makedirs(path, exist_ok=True)
+    base = Image.effect_noise((size, size), 64).convert("RGBA")
+    for i in range(count):
+        sub = os.path.join(path, f"cat{i % 4}")
+        os.makedirs(sub, exist_ok=True)
+        base.rotate(i % 360).save(os.path.join(sub, f"img_{i:05d}.png"), compress_level=1)
+
+
+def bench_assets(args):
+    """AssetManager startup: serial vs thread-pool decode, then a cached start."""
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    tmp = tempfile.mkdtemp(prefix="tt_bench_assets_")
+    try:
+        _make_image_library(tmp, args.images)
+
+        start = time.perf_counter()
+        serial = AssetManager(tmp, workers=1)
+        serial_ms = (time.perf_counter() - start) * 1000.0
+
+        # cold start for both runs: drop the thumbnail cache + registry
+        shutil.rmtree(os.path.join(tmp, ".cache"), ignore_errors=True)
+
+        start = time.perf_counter()
+        parallel = AssetManager(tmp, workers=args.workers)
+        parallel_ms = (time.perf_counter() - start) * 1000.0
+
+        print(f"images={args.images} loaded={len(parallel.assets)} workers={args.workers}")
+        print(f"  serial   : {serial_ms:8.1f} ms")
+        start = time.perf_counter()
+        AssetManager(tmp, workers=args.workers)
+        warm_ms = (time.perf_counter() - start) * 1000.0
+
+        print(f"  parallel : {parallel_ms:8.1f} ms  (x{serial_ms / parallel_ms:.2f})")
+        print(f"  warm     : {warm_ms:8.1f} ms  (thumbnail cache)")
+        assert list(serial.assets) == list(parallel.assets)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "assets": bench_assets,
+    "dice": bench_dice,
+    "lod": bench_lod,
+    "select": bench_select,
+    "scripts": bench_scripts,
+    "tiles": bench_tiles,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UMI.DA Tabletop micro-benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS), help="Benchmark to run")
+    parser.add_argument("--tokens", type=int, default=2000, help="Token count (default 2000)")
+    parser.add_argument("--zoom", type=float, default=0.2, help="Camera zoom (default 0.2)")
+    parser.add_argument("--selected", type=int, default=1000, help="Selected tokens (default 1000)")
+    parser.add_argument("--frames", type=int, default=30, help="Frames to time (default 30)")
+    parser.add_argument("--images", type=int, default=300, help="Generated images (default 300)")
+    parser.add_argument("--dice", type=int, default=1000000, help="Dice to roll (default 1000000)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Max script worker processes (default: CPU count)",
+    )
+    args = parser.parse_args()
+
+    pygame.init()
+    BENCHMARKS[args.name](args)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
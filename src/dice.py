@@ -0,0 +1,452 @@
+import math
+import random
+import re
+from collections import OrderedDict
+from itertools import combinations_with_replacement
+
+try:
+    import numpy as np
+except ImportError:  # bulk rolling falls back to a Python loop
+    np = None
+
+
+# ----------------------------------------------------------------------
+# DICE EXPRESSIONS
+#
+#   4d6kh3+2     keep the highest 3 of 4d6, plus 2
+#   2d20kl1      disadvantage
+#   3d6!         exploding: every max roll adds another die
+#   6d10>=7      pool: count dice showing 7 or more
+#   d%           same as 1d100
+#
+# Term syntax: [N]dS[!][kh|kl|dh|dl[n]][>=|<=|>|<|=T], or an integer.
+# Terms are joined with + and -.
+# ----------------------------------------------------------------------
+
+MAX_DICE = 1000  # dice per term
+MAX_SIDES = 1000
+MAX_EXPLODE = 50  # extra dice per exploding die
+MAX_ENUM = 200000  # multisets enumerated for exact keep/drop odds
+# distinct totals for exact odds; convolution is quadratic in this
+MAX_SUPPORT = 50000 if np is not None else 2000
+
+_TERM_RE = re.compile(
+    r"(?:(\d*)d(\d+|%)(!)?(?:(kh|kl|dh|dl)(\d*))?(?:(>=|<=|>|<|=)(\d+))?)|(\d+)"
+)
+
+_COMPARE = {
+    ">=": lambda v, t: v >= t,
+    "<=": lambda v, t: v <= t,
+    ">": lambda v, t: v > t,
+    "<": lambda v, t: v < t,
+    "=": lambda v, t: v == t,
+}
+
+_parsed = OrderedDict()  # expression -> terms (small LRU)
+
+
+class DiceError(ValueError):
+    pass
+
+
+def parse(expr):
+    """
+    Parse a dice expression into a list of (sign, term) pairs. A term is
+    either {"const": n} or a dict with count, sides, explode, keep
+    (("h" | "l", n) or None) and target ((op, value) or None).
+    """
+    key = str(expr)
+    terms = _parsed.get(key)
+    if terms is not None:
+        _parsed.move_to_end(key)
+        return terms
+
+    text = key.replace(" ", "").lower()
+    if not text:
+        raise DiceError("Empty dice expression")
+
+    terms = []
+    pos = 0
+    sign = 1
+    if text[0] in "+-":
+        sign = -1 if text[0] == "-" else 1
+        pos = 1
+    while True:
+        m = _TERM_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise DiceError(f"Invalid dice expression at '{text[pos:] or text}'")
+        terms.append((sign, _make_term(m)))
+        pos = m.end()
+        if pos == len(text):
+            break
+        if text[pos] not in "+-":
+            raise DiceError(f"Invalid dice expression at '{text[pos:]}'")
+        sign = -1 if text[pos] == "-" else 1
+        pos += 1
+
+    _parsed[key] = terms
+    if len(_parsed) > 256:
+        _parsed.popitem(last=False)
+    return terms
+
+
+def _make_term(m):
+    count_s, sides_s, bang, keep_op, keep_n, cmp_op, cmp_v, const = m.groups()
+    if const is not None:
+        return {"const": int(const), "text": const}
+
+    count = int(count_s) if count_s else 1
+    sides = 100 if sides_s == "%" else int(sides_s)
+    if not 1 <= count <= MAX_DICE:
+        raise DiceError(f"Dice count must be 1-{MAX_DICE}")
+    if not 1 <= sides <= MAX_SIDES:
+        raise DiceError(f"Dice sides must be 1-{MAX_SIDES}")
+    if bang and sides < 2:
+        raise DiceError("Exploding dice need at least 2 sides")
+
+    keep = None
+    if keep_op:
+        n = int(keep_n) if keep_n else 1
+        if keep_op == "kh":
+            keep = ("h", n)
+        elif keep_op == "kl":
+            keep = ("l", n)
+        elif keep_op == "dh":
+            keep = ("l", count - n)
+        else:
+            keep = ("h", count - n)
+        if not 0 <= keep[1] <= count:
+            raise DiceError(f"Cannot keep {keep[1]} of {count} dice")
+
+    target = (cmp_op, int(cmp_v)) if cmp_op else None
+    return {
+        "count": count,
+        "sides": sides,
+        "explode": bool(bang),
+        "keep": keep,
+        "target": target,
+        "text": m.group(0),
+    }
+
+
+# ----------------------------------------------------------------------
+# ROLLING
+# ----------------------------------------------------------------------
+
+
+def roll(expr, rng=None):
+    """
+    Roll a dice expression once. rng is any object with randint()
+    (default: the random module). Returns
+        {"expr": ..., "total": int, "terms": [{"text", "sign", "rolls",
+         "kept", "value", "hits"}, ...]}
+    """
+    rng = rng or random
+    total = 0
+    out = []
+    for sign, term in parse(expr):
+        if "const" in term:
+            value = term["const"]
+            out.append(
+                {"text": term["text"], "sign": sign, "rolls": [], "kept": [], "value": value, "hits": False}
+            )
+        else:
+            rolls = _roll_pool(term, rng)
+            kept = _keep_indices(rolls, term["keep"])
+            if term["target"] is not None:
+                op, t = term["target"]
+                value = sum(1 for i in kept if _COMPARE[op](rolls[i], t))
+            else:
+                value = sum(rolls[i] for i in kept)
+            out.append(
+                {
+                    "text": term["text"],
+                    "sign": sign,
+                    "rolls": rolls,
+                    "kept": kept,
+                    "value": value,
+                    "hits": term["target"] is not None,
+                }
+            )
+        total += sign * value
+    return {"expr": str(expr), "total": total, "terms": out}
+
+
+def _roll_pool(term, rng):
+    sides = term["sides"]
+    rolls = [rng.randint(1, sides) for _ in range(term["count"])]
+    if term["explode"]:
+        # every max roll adds one more die to the pool
+        pending = sum(1 for v in rolls if v == sides)
+        extra = 0
+        while pending and extra < MAX_EXPLODE * term["count"]:
+            v = rng.randint(1, sides)
+            rolls.append(v)
+            extra += 1
+            pending -= 1
+            if v == sides:
+                pending += 1
+    return rolls
+
+
+def _keep_indices(rolls, keep):
+    if keep is None:
+        return list(range(len(rolls)))
+    side, n = keep
+    order = sorted(range(len(rolls)), key=rolls.__getitem__, reverse=side == "h")
+    return sorted(order[:n])
+
+
+def format_roll(result):
+    """'4d6kh3+2: [6, 5, 3, (1)] + 2 = 16' -- dropped dice in parentheses."""
+    parts = []
+    for i, term in enumerate(result["terms"]):
+        if term["rolls"]:
+            kept = set(term["kept"])
+            dice = ", ".join(
+                str(v) if j in kept else f"({v})" for j, v in enumerate(term["rolls"])
+            )
+            piece = f"[{dice}]"
+            if term["hits"]:
+                piece += f" {term['value']} hit{'s' if term['value'] != 1 else ''}"
+        else:
+            piece = str(term["value"])
+        if i == 0:
+            parts.append(piece if term["sign"] > 0 else f"-{piece}")
+        else:
+            parts.append(("+ " if term["sign"] > 0 else "- ") + piece)
+    return f"{result['expr']}: {' '.join(parts)} = {result['total']}"
+
+
+def roll_many(expr, n, seed=None):
+    """
+    Roll an expression n times and return the n totals, vectorized with
+    NumPy when it is installed (a numpy array) and as a list otherwise.
+    """
+    terms = parse(expr)
+    if np is None:
+        rng = random.Random(seed)
+        return [roll(expr, rng)["total"] for _ in range(n)]
+
+    gen = np.random.default_rng(seed)
+    totals = np.zeros(n, dtype=np.int64)
+    for sign, term in terms:
+        if "const" in term:
+            totals += sign * term["const"]
+        else:
+            totals += sign * _roll_term_many(term, n, gen)
+    return totals
+
+
+def _roll_term_many(term, n, gen):
+    count, sides = term["count"], term["sides"]
+    if term["explode"] and term["keep"] is not None:
+        # pools grow per row; no fixed-width array to sort
+        rng = random.Random(int(gen.integers(1 << 62)))
+        one = [(1, term)]
+        return np.fromiter(
+            (_total_of(one, rng) for _ in range(n)), dtype=np.int64, count=n
+        )
+
+    rolls = gen.integers(1, sides + 1, size=(n, count), dtype=np.int64)
+    if term["keep"] is not None:
+        side, k = term["keep"]
+        rolls = np.sort(rolls, axis=1)
+        rolls = rolls[:, count - k :] if side == "h" else rolls[:, :k]
+
+    if term["target"] is not None:
+        op, t = term["target"]
+        value = _COMPARE[op](rolls, t).sum(axis=1)
+    else:
+        value = rolls.sum(axis=1)
+
+    if term["explode"]:
+        pending = (rolls == sides).sum(axis=1)
+        for _ in range(MAX_EXPLODE * count):
+            if not pending.any():
+                break
+            extra = gen.integers(1, sides + 1, size=n, dtype=np.int64)
+            extra[pending == 0] = 0
+            if term["target"] is not None:
+                op, t = term["target"]
+                value += _COMPARE[op](extra, t) & (pending > 0)
+            else:
+                value += extra
+            pending = pending - (pending > 0) + (extra == sides)
+    return value
+
+
+def _total_of(terms, rng):
+    total = 0
+    for sign, term in terms:
+        rolls = _roll_pool(term, rng)
+        kept = _keep_indices(rolls, term["keep"])
+        if term["target"] is not None:
+            op, t = term["target"]
+            total += sign * sum(1 for i in kept if _COMPARE[op](rolls[i], t))
+        else:
+            total += sign * sum(rolls[i] for i in kept)
+    return total
+
+
+# ----------------------------------------------------------------------
+# EXACT DISTRIBUTIONS
+#
+# A distribution is (lo, probs): probs[i] is P(total == lo + i).
+# ----------------------------------------------------------------------
+
+
+def distribution(expr):
+    """
+    Exact probability of every total of an expression, as an ordered
+    {total: probability} dict. Exploding dice are truncated after
+    MAX_EXPLODE extra dice (the remaining mass sits on the last value).
+    Raises DiceError for combinations without an exact method or with more
+    than MAX_SUPPORT possible totals.
+    """
+    lo, probs = 0, [1.0]
+    for sign, term in parse(expr):
+        t_lo, t_probs = _term_distribution(term)
+        if len(probs) + len(t_probs) - 1 > MAX_SUPPORT:
+            raise DiceError(f"Too many totals for exact odds of {expr.strip()}")
+        if sign < 0:
+            t_lo, t_probs = -(t_lo + len(t_probs) - 1), t_probs[::-1]
+        lo, probs = lo + t_lo, _convolve(probs, t_probs)
+    return OrderedDict((lo + i, p) for i, p in enumerate(probs) if p > 0.0)
+
+
+def summarize(dist):
+    """{"min", "max", "mean", "mode"} of a distribution() result."""
+    mean = sum(v * p for v, p in dist.items())
+    mode = max(dist, key=dist.get)
+    return {"min": min(dist), "max": max(dist), "mean": mean, "mode": mode}
+
+
+def _term_distribution(term):
+    if "const" in term:
+        return term["const"], [1.0]
+
+    count, sides = term["count"], term["sides"]
+    if term["keep"] is not None:
+        if term["explode"]:
+            raise DiceError("No exact odds for exploding dice with keep/drop")
+        return _keep_distribution(term)
+
+    if term["target"] is not None:
+        die = _success_die(term)
+    elif term["explode"]:
+        die = _exploding_die(sides)
+    else:
+        die = (1, [1.0 / sides] * sides)
+    if (len(die[1]) - 1) * count + 1 > MAX_SUPPORT:
+        raise DiceError(f"Too many totals for exact odds of {term['text']}")
+    return _power(die, count)
+
+
+def _success_die(term):
+    # successes contributed by one die (and, if exploding, its extra dice)
+    op, t = term["target"]
+    sides = term["sides"]
+    p_hit = sum(1 for v in range(1, sides + 1) if _COMPARE[op](v, t)) / sides
+    single = [1.0 - p_hit, p_hit]
+    if not term["explode"]:
+        return 0, single
+
+    p_max = 1.0 / sides
+    max_hits = _COMPARE[op](sides, t)
+    # a max roll is a (hit or miss) plus one more die
+    stop = single[:]
+    if max_hits:
+        stop[1] -= p_max
+    else:
+        stop[0] -= p_max
+    shift = [0.0, 1.0] if max_hits else [1.0]
+    probs = single
+    for _ in range(MAX_EXPLODE):
+        chain = _convolve(shift, probs)
+        probs = _add(stop, [p * p_max for p in chain])
+    return 0, probs
+
+
+def _exploding_die(sides):
+    p = 1.0 / sides
+    probs = [0.0] * (sides * (MAX_EXPLODE + 1))
+    weight = p
+    for k in range(MAX_EXPLODE + 1):
+        base = k * sides
+        for v in range(1, sides):
+            probs[base + v - 1] = weight
+        weight *= p
+    # truncated tail
+    probs[-1] = weight * sides
+    return 1, probs
+
+
+def _keep_distribution(term):
+    count, sides = term["count"], term["sides"]
+    side, k = term["keep"]
+    if math.comb(count + sides - 1, count) > MAX_ENUM:
+        raise DiceError(f"Too many outcomes for exact odds of {term['text']}")
+
+    hits = None
+    if term["target"] is not None:
+        op, t = term["target"]
+        hits = _COMPARE[op]
+    total_outcomes = float(sides) ** count
+    fact = math.factorial(count)
+    dist = {}
+    for combo in combinations_with_replacement(range(1, sides + 1), count):
+        # combo is ascending; multiplicity gives the number of orderings
+        ways = fact
+        run = 1
+        for i in range(1, count + 1):
+            if i < count and combo[i] == combo[i - 1]:
+                run += 1
+            else:
+                ways //= math.factorial(run)
+                run = 1
+        kept = combo[count - k :] if side == "h" else combo[:k]
+        if hits is not None:
+            value = sum(1 for v in kept if hits(v, t))
+        else:
+            value = sum(kept)
+        dist[value] = dist.get(value, 0.0) + ways / total_outcomes
+
+    lo = min(dist)
+    probs = [0.0] * (max(dist) - lo + 1)
+    for v, p in dist.items():
+        probs[v - lo] = p
+    return lo, probs
+
+
+def _power(dist, n):
+    # n-fold convolution by repeated squaring
+    lo, probs = dist
+    r_lo, r_probs = 0, [1.0]
+    while n:
+        if n & 1:
+            r_lo, r_probs = r_lo + lo, _convolve(r_probs, probs)
+        n >>= 1
+        if n:
+            lo, probs = lo * 2, _convolve(probs, probs)
+    return r_lo, r_probs
+
+
+def _convolve(a, b):
+    if np is not None:
+        return np.convolve(a, b).tolist()
+    out = [0.0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                out[i + j] += x * y
+    return out
+
+
+def _add(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    out = list(a)
+    for i, y in enumerate(b):
+        out[i] += y
+    return out
@@ -1,7 +1,7 @@
 import pygame
 import sys
 from assets import AssetManager
-from token import TokenManager
+from tokens import FORMATIONS, TokenManager
 from ui import Button, ContextMenu, PropertiesWindow, AssetBrowserPanel, TextInput
 from utils import (
     roll_dice,
@@ -12,6 +12,7 @@ from utils import (
 )
 from tilemap import TileMap
 from rules import RulesEngine
+import dice
 import os
 import tkinter as tk
 from tkinter import filedialog, simpledialog
@@ -28,6 +29,10 @@ GRID_SIZE = 64
 SHOW_GRID_DEFAULT = True
 SNAP_DEFAULT = True
 
+# Import assets into the content-addressed store (assets/.store) instead of
+# copying them next to the other images; see AssetManager(use_store=...)
+ASSET_STORE = False
+
 CAMERA_ZOOM_MIN = 0.2
 CAMERA_ZOOM_MAX = 4.0
 
@@ -124,6 +129,68 @@ class NetworkClient:
         return out
 
 
+def send_token_batch(net_client, tokens, deleted_ids=()):
+    """Send several token changes/deletions as a single network message."""
+    if not net_client.connected:
+        return
+    net_client.send(
+        {
+            "type": "token_batch",
+            "tokens": [t.to_dict() for t in tokens],
+            "deleted": list(deleted_ids),
+        }
+    )
+
+
+def apply_token_update(token_mgr, td, by_id=None):
+    """
+    Apply one token dict received from the network: create the token if
+    it is unknown, otherwise update it in place. by_id is an optional
+    {id: Token} map to avoid scanning token_mgr.tokens per update.
+    """
+    if not isinstance(td, dict):
+        return
+    tid = td.get("id")
+    if not tid:
+        return
+
+    if by_id is not None:
+        existing = by_id.get(tid)
+    else:
+        existing = None
+        for t in token_mgr.tokens:
+            if t.id == tid:
+                existing = t
+                break
+
+    if existing is None:
+        t = token_mgr.create_token_from_dict(td)
+        if t is not None:
+            if by_id is not None:
+                by_id[t.id] = t
+        return
+
+    existing.x = td.get("x", existing.x)
+    existing.y = td.get("y", existing.y)
+    existing.rotation = td.get("rotation", existing.rotation)
+    existing.scale = td.get("scale", existing.scale)
+    existing.visible = td.get("visible", existing.visible)
+    existing.name = td.get("name", existing.name)
+    existing.hp = td.get("hp", existing.hp)
+    existing.max_hp = td.get("max_hp", existing.max_hp)
+    existing.notes = td.get("notes", existing.notes)
+    existing.gm_only_notes = td.get("gm_only_notes", existing.gm_only_notes)
+    tint = td.get("tint", list(existing.tint))
+    if isinstance(tint, (list, tuple)) and len(tint) == 3:
+        existing.tint = tuple(max(0.0, min(1.0, float(v))) for v in tint)
+    existing.border_style = td.get("border_style", existing.border_style)
+    existing.locked = td.get("locked", existing.locked)
+    token_mgr.set_token_group(existing, td.get("group_id", existing.group_id))
+    existing.z_index = td.get("z_index", existing.z_index)
+    existing.scripts = dict(td.get("scripts", existing.scripts))
+    existing.update_transformed_surface()
+
+
 def draw_grid(surface, grid_size, camera_x, camera_y, camera_zoom, color=(70, 70, 75)):
     w, h = surface.get_size()
     if camera_zoom <= 0:
@@ -236,6 +303,39 @@ def choose_token_import_path(data_dir):
     return path or None
 
 
+def draw_loading_screen(surface, done, total, label=""):
+    """Progress bar while the asset library loads (AssetManager progress)."""
+    pygame.event.pump()
+    surface.fill((30, 30, 35))
+    w, h = surface.get_size()
+    bar = pygame.Rect(w // 2 - 200, h // 2 - 10, 400, 20)
+    pygame.draw.rect(surface, (60, 60, 70), bar, border_radius=4)
+    if total:
+        fill = bar.copy()
+        fill.w = int(bar.w * done / total)
+        pygame.draw.rect(surface, (90, 140, 220), fill, border_radius=4)
+    font = pygame.font.SysFont(None, 22)
+    txt = font.render(f"Loading assets {done}/{total}  {label}", True, (220, 220, 220))
+    surface.blit(txt, (bar.x, bar.bottom + 8))
+    pygame.display.flip()
+
+
+def draw_script_profile(surface, font, lines, right, top):
+    """Top script offenders (RulesEngine.profile_lines) in a dark box."""
+    if len(lines) == 1:
+        lines = lines + ["(no scripts run yet)"]
+    line_h = font.get_height() + 2
+    w = max(font.size(line)[0] for line in lines) + 12
+    rect = pygame.Rect(right - w, top, w, line_h * len(lines) + 8)
+    pygame.draw.rect(surface, (15, 15, 20), rect, border_radius=4)
+    pygame.draw.rect(surface, (90, 90, 110), rect, 1, border_radius=4)
+    y = rect.y + 4
+    for i, line in enumerate(lines):
+        color = (170, 200, 255) if i == 0 else (220, 220, 220)
+        surface.blit(font.render(line, True, color), (rect.x + 6, y))
+        y += line_h
+
+
 def fit_camera_to_background(bg_surf, camera):
     camera_x, camera_y, camera_zoom = camera
     bw, bh = bg_surf.get_size()
@@ -271,7 +371,12 @@ def main():
     os.makedirs(assets_dir, exist_ok=True)
     os.makedirs(data_dir, exist_ok=True)
 
-    asset_mgr = AssetManager(assets_dir)
+    def asset_progress(done, total, name):
+        # redraw every few images; a frame per image would dominate small loads
+        if done == total or done % 16 == 0:
+            draw_loading_screen(screen, done, total, name)
+
+    asset_mgr = AssetManager(assets_dir, progress=asset_progress, use_store=ASSET_STORE)
     token_mgr = TokenManager(asset_mgr)
 
     # camera
@@ -282,6 +387,7 @@ def main():
     # background
     background_surface = None
     background_path = None
+    background_future = None  # (Future, path) while a campaign background decodes
 
     # dungeon / tilemap
     tilemap = TileMap(width=100, height=100, tile_size=GRID_SIZE)
@@ -293,6 +399,16 @@ def main():
     tile_line_drag = False
     tile_line_start = (0, 0)
 
+    def assets_in_use():
+        # full-size surfaces that must stay resident (AssetManager budget)
+        used = {t.asset for t in token_mgr.tokens}
+        used.update(tile.sprite for tile in tilemap.tiles.values() if tile.sprite)
+        if background_path:
+            used.add(os.path.abspath(background_path))
+        return used
+
+    asset_mgr.in_use = assets_in_use
+
     # Rules engine
     say_messages = []
 
@@ -335,11 +451,15 @@ def main():
 
     asset_panel_rect = pygame.Rect(0, 58, 280, HEIGHT - 58)
     asset_panel = AssetBrowserPanel(asset_panel_rect, asset_mgr)
+    asset_mgr.watch()
+    print(f"[INFO] Watching assets folder ({asset_mgr.watcher.backend})")
 
     dice_result = None
     font = pygame.font.SysFont(None, 24)
     say_font = pygame.font.SysFont(None, 20)
     chat_font = pygame.font.SysFont(None, 18)
+    profile_font = pygame.font.SysFont("monospace", 13)
+    script_profile_open = False
 
     context_menu = None
     properties_window = None
@@ -370,6 +490,61 @@ def main():
                 and chat_input.active
             ):
                 text = chat_input.text.strip()
+                if text.startswith("/odds "):
+                    # local only: exact odds of a dice expression
+                    try:
+                        stats = dice.summarize(dice.distribution(text[6:]))
+                        chat_messages.append(
+                            (
+                                "Dice",
+                                f"{text[6:].strip()}: {stats['min']}-{stats['max']}, "
+                                f"mean {stats['mean']:.2f}, most likely {stats['mode']}",
+                            )
+                        )
+                    except dice.DiceError as e:
+                        chat_messages.append(("Dice", str(e)))
+                    text = ""
+                elif text.startswith("/spawn "):
+                    # /spawn <asset> [count] [formation], at the view centre
+                    args = text[7:].split()
+                    formation = "grid"
+                    count = 1
+                    if args and args[-1] in FORMATIONS:
+                        formation = args.pop()
+                    if args and args[-1].isdigit():
+                        count = int(args.pop())
+                    asset_name = " ".join(args)
+                    if asset_name in asset_mgr.assets:
+                        cx = asset_drop_rect.x + asset_drop_rect.w // 2
+                        cy = asset_drop_rect.y + asset_drop_rect.h // 2
+                        wx, wy = screen_to_world(
+                            cx, cy, camera_x, camera_y, camera_zoom, board_rect
+                        )
+                        spawned = token_mgr.spawn_many(
+                            [{"asset": asset_name, "count": min(count, 200)}],
+                            wx,
+                            wy,
+                            formation,
+                            GRID_SIZE,
+                        )
+                        if spawned:
+                            rules_engine.run_event_batch(
+                                "onSpawn", spawned, {"pos": (wx, wy)}
+                            )
+                            send_token_batch(net_client, spawned)
+                    else:
+                        chat_messages.append(("Spawn", f"Unknown asset: {asset_name}"))
+                    text = ""
+                elif text.startswith("/roll "):
+                    try:
+                        result = dice.roll(
+                            text[6:].strip(), rules_engine.rng.stream("session")
+                        )
+                        dice_result = result["total"]
+                        text = dice.format_roll(result)
+                    except dice.DiceError as e:
+                        chat_messages.append(("Dice", str(e)))
+                        text = ""
                 if text:
                     sender = net_client.name if net_client.connected else "Local"
                     chat_messages.append((sender, text))
@@ -411,6 +586,16 @@ def main():
                 elif event.key == pygame.K_g:
                     tile_tool = "pencil"
                     tile_type = "floor"
+                elif event.key == pygame.K_F3:
+                    # script profiler overlay; the report goes to the console on close
+                    script_profile_open = not script_profile_open
+                    rules_engine.profiling = script_profile_open
+                    if script_profile_open:
+                        rules_engine.reset_profile()
+                    else:
+                        print("[INFO] Script profile:")
+                        for line in rules_engine.profile_lines(limit=25):
+                            print("  " + line)
                 elif event.key == pygame.K_F11:
                     fullscreen = not fullscreen
                     flags = pygame.FULLSCREEN if fullscreen else 0
@@ -638,56 +823,62 @@ def main():
                 # process onMove events for rules + network + tile triggers
                 if token_mgr.pending_move_events:
                     for mevt in token_mgr.pending_move_events:
-                        t = mevt["token"]
-                        from_x, from_y = mevt["from"]
-                        to_x, to_y = mevt["to"]
-
-                        rules_engine.run_event(
-                            "onMove",
-                            t,
-                            None,
-                            {"from": (from_x, from_y), "to": (to_x, to_y)},
-                        )
+                        moves = mevt.get("moves", [mevt])
+                        for move in moves:
+                            t = move["token"]
+                            from_x, from_y = move["from"]
+                            to_x, to_y = move["to"]
 
-                        if net_client.connected:
-                            net_client.send(
-                                {
-                                    "type": "token_update",
-                                    "token": t.to_dict(),
-                                }
+                            rules_engine.run_event(
+                                "onMove",
+                                t,
+                                None,
+                                {"from": (from_x, from_y), "to": (to_x, to_y)},
                             )
 
-                        if tilemap is not None and tilemap.tile_size > 0:
-                            ts = tilemap.tile_size
-                            from_tx = int(from_x // ts)
-                            from_ty = int(from_y // ts)
-                            to_tx = int(to_x // ts)
-                            to_ty = int(to_y // ts)
-
-                            if from_tx != to_tx or from_ty != to_ty:
-                                from_tile = tilemap.get_tile(from_tx, from_ty)
-                                to_tile = tilemap.get_tile(to_tx, to_ty)
-
-                                if from_tile is not None:
-                                    rules_engine.run_event(
-                                        "onLeaveTile",
-                                        t,
-                                        from_tile,
-                                        {
-                                            "from": (from_tx, from_ty),
-                                            "to": (to_tx, to_ty),
-                                        },
-                                    )
-                                if to_tile is not None:
-                                    rules_engine.run_event(
-                                        "onEnterTile",
-                                        t,
-                                        to_tile,
-                                        {
-                                            "from": (from_tx, from_ty),
-                                            "to": (to_tx, to_ty),
-                                        },
-                                    )
+                            if net_client.connected and len(moves) == 1:
+                                net_client.send(
+                                    {
+                                        "type": "token_update",
+                                        "token": t.to_dict(),
+                                    }
+                                )
+
+                            if tilemap is not None and tilemap.tile_size > 0:
+                                ts = tilemap.tile_size
+                                from_tx = int(from_x // ts)
+                                from_ty = int(from_y // ts)
+                                to_tx = int(to_x // ts)
+                                to_ty = int(to_y // ts)
+
+                                if from_tx != to_tx or from_ty != to_ty:
+                                    from_tile = tilemap.get_tile(from_tx, from_ty)
+                                    to_tile = tilemap.get_tile(to_tx, to_ty)
+
+                                    if from_tile is not None:
+                                        rules_engine.run_event(
+                                            "onLeaveTile",
+                                            t,
+                                            from_tile,
+                                            {
+                                                "from": (from_tx, from_ty),
+                                                "to": (to_tx, to_ty),
+                                            },
+                                        )
+                                    if to_tile is not None:
+                                        rules_engine.run_event(
+                                            "onEnterTile",
+                                            t,
+                                            to_tile,
+                                            {
+                                                "from": (from_tx, from_ty),
+                                                "to": (to_tx, to_ty),
+                                            },
+                                        )
+
+                        if len(moves) > 1:
+                            # group drop: one message for every token moved
+                            send_token_batch(net_client, [m["token"] for m in moves])
 
                     token_mgr.pending_move_events.clear()
 
@@ -748,6 +939,19 @@ def main():
                         path = choose_token_export_path(data_dir, t.id)
                         if path:
                             export_token(path, t)
+                elif act == "batch":
+                    batch_tokens = action_payload.get("tokens", [])
+                    deleted = action_payload.get("deleted", [])
+                    rules_engine.run_event_batch(
+                        "onBatchAction", batch_tokens, {"action": action_payload.get("op")}
+                    )
+                    # scripts may have touched tokens the action itself skipped
+                    # (locked ones), so send every surviving token
+                    send_token_batch(
+                        net_client,
+                        [t for t in batch_tokens if t.id not in deleted],
+                        deleted,
+                    )
 
             # top bar buttons
             if (
@@ -784,7 +988,7 @@ def main():
                                     }
                                 )
                 elif btn_roll.rect.collidepoint(mx, my):
-                    dice_result = roll_dice(20)
+                    dice_result = roll_dice(20, rules_engine.rng.stream("session"))
                 elif btn_save.rect.collidepoint(mx, my):
                     path = choose_campaign_save_path(data_dir)
                     if path:
@@ -809,23 +1013,31 @@ def main():
                 elif btn_load.rect.collidepoint(mx, my):
                     path = choose_campaign_load_path(data_dir)
                     if path:
+                        # rescan first: the campaign's assets are registered
+                        # and prefetched by load_campaign
+                        asset_mgr.refresh_assets()
                         bg_state = load_campaign(
                             path,
                             asset_mgr,
                             token_mgr,
                             tilemap,
                             rules_engine,
+                            precompile_scripts=True,
+                            prefetch_assets=True,
+                            view_size=(WIDTH, HEIGHT - 58),
                         )
-                        asset_mgr.refresh_assets()
                         if asset_panel_open:
                             asset_panel._build_categories()
                             asset_panel._rebuild_filtered_list()
                         background_surface = None
                         background_path = None
+                        background_future = None
                         if bg_state:
                             p = bg_state.get("path")
                             cam = bg_state.get("camera", {})
-                            if p and os.path.exists(p):
+                            if bg_state.get("surface_future") is not None:
+                                background_future = (bg_state["surface_future"], p)
+                            elif p and os.path.exists(p):
                                 surf = asset_mgr._load_surface(p)
                                 if surf:
                                     background_surface = surf
@@ -851,6 +1063,7 @@ def main():
                         if surf:
                             background_surface = surf
                             background_path = fp
+                            background_future = None
                             camera_x, camera_y, camera_zoom = fit_camera_to_background(
                                 background_surface,
                                 (camera_x, camera_y, camera_zoom),
@@ -905,51 +1118,22 @@ def main():
                             if surf:
                                 background_surface = surf
                                 background_path = p
+                                background_future = None
                         camera_x = float(cam.get("x", camera_x))
                         camera_y = float(cam.get("y", camera_y))
                         camera_zoom = float(cam.get("zoom", camera_zoom))
                 elif mtype == "token_update":
-                    td = msg.get("token")
-                    if isinstance(td, dict):
-                        tid = td.get("id")
-                        if tid:
-                            existing = None
-                            for t in token_mgr.tokens:
-                                if t.id == tid:
-                                    existing = t
-                                    break
-                            if existing is None:
-                                token_mgr.create_token_from_dict(td)
-                            else:
-                                existing.x = td.get("x", existing.x)
-                                existing.y = td.get("y", existing.y)
-                                existing.rotation = td.get("rotation", existing.rotation)
-                                existing.scale = td.get("scale", existing.scale)
-                                existing.visible = td.get("visible", existing.visible)
-                                existing.name = td.get("name", existing.name)
-                                existing.hp = td.get("hp", existing.hp)
-                                existing.max_hp = td.get("max_hp", existing.max_hp)
-                                existing.notes = td.get("notes", existing.notes)
-                                existing.gm_only_notes = td.get(
-                                    "gm_only_notes", existing.gm_only_notes
-                                )
-                                tint = td.get("tint", list(existing.tint))
-                                if isinstance(tint, (list, tuple)) and len(tint) == 3:
-                                    existing.tint = tuple(
-                                        max(0.0, min(1.0, float(v))) for v in tint
-                                    )
-                                existing.border_style = td.get(
-                                    "border_style", existing.border_style
-                                )
-                                existing.locked = td.get("locked", existing.locked)
-                                existing.group_id = td.get(
-                                    "group_id", existing.group_id
-                                )
-                                existing.z_index = td.get("z_index", existing.z_index)
-                                existing.scripts = dict(
-                                    td.get("scripts", existing.scripts)
-                                )
-                                existing.update_transformed_surface()
+                    apply_token_update(token_mgr, msg.get("token"))
+                elif mtype == "token_batch":
+                    deleted = set(msg.get("deleted") or [])
+                    if deleted:
+                        gone = [t for t in token_mgr.tokens if t.id in deleted]
+                        if gone:
+                            token_mgr.perform_batch_action("delete", gone)
+                            token_mgr.last_action = None
+                    by_id = {t.id: t for t in token_mgr.tokens}
+                    for td in msg.get("tokens") or []:
+                        apply_token_update(token_mgr, td, by_id)
                 elif mtype == "chat":
                     sender = msg.get("from", "??")
                     text = msg.get("message", "")
@@ -958,6 +1142,44 @@ def main():
 
         token_mgr.update(dt)
 
+        # cascading rule events (trigger / onHPChange / onDeath)
+        rules_engine.process_queue()
+
+        # finish background-decoded campaign assets (load_campaign prefetch)
+        asset_mgr.poll_prefetch()
+        token_mgr.poll_pending_assets()
+        if background_future is not None and background_future[0].done():
+            decoded = background_future[0].result()
+            if decoded:
+                background_surface = asset_mgr._to_surface(*decoded)
+                background_path = background_future[1]
+            background_future = None
+
+        # files added/edited/removed in assets/ while running
+        added, changed, removed = asset_mgr.poll_changes()
+        if added or changed or removed:
+            asset_panel.apply_asset_changes(added, changed, removed)
+
+        # script precompile report (started by load_campaign)
+        pre = rules_engine.precompile_future
+        if pre is not None and pre.done():
+            rules_engine.precompile_future = None
+            try:
+                report = pre.result()
+            except Exception as e:
+                report = []
+                print(f"[ERROR] Script precompile failed: {e}")
+            for entry in report:
+                loc = entry["location"]
+                if loc["kind"] == "token":
+                    where = f"token {loc['name']} ({loc['id']}) {loc['event']}"
+                elif loc["kind"] == "tile":
+                    where = f"tile ({loc['x']}, {loc['y']}) {loc['event']}"
+                else:
+                    where = f"global {loc['event']}"
+                print(f"[WARNING] Invalid script in {where}: {entry['error']}")
+                ui_say(f"Invalid script in {where}")
+
         # ------------------------------------------------------------------
         # RENDERING
         # ------------------------------------------------------------------
@@ -1035,6 +1257,15 @@ def main():
         if properties_window:
             properties_window.draw(screen)
 
+        # script profiler (F3)
+        if script_profile_open:
+            mem = asset_mgr.mem_stats
+            lines = rules_engine.profile_lines(limit=8) + [
+                f"assets: {mem['bytes_resident'] / 1048576:.1f} MB resident, "
+                f"{mem['evictions']} evicted, {mem['reloads']} reloaded"
+            ]
+            draw_script_profile(screen, profile_font, lines, WIDTH - 10, 64)
+
         # dice result
         if dice_result is not None:
             txt = font.render(f"Rol: {dice_result}", True, (255, 255, 255))
@@ -1068,6 +1299,8 @@ def main():
 
         pygame.display.flip()
 
+    rules_engine.close()
+    asset_mgr.close()
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import random
+
+
+# ----------------------------------------------------------------------
+# SEEDABLE RANDOM STREAMS
+#
+# Every stream is a counter-based generator: draw i of stream "name" is
+# blake2b(i) keyed with sha256("<seed>:<name>"). Its whole state is the
+# draw counter, so a campaign can store every stream in a few bytes and
+# a replay from the same state produces the same rolls.
+#
+# Stream names in use:
+#   "session"        chat /roll, the Roll button
+#   "token:<id>"     scripts running for a token
+#   "global:<event>" global/tile scripts without a token
+# ----------------------------------------------------------------------
+
+
+class RNGStream(random.Random):
+    """random.Random drop-in whose state is a single draw counter."""
+
+    def __init__(self, key, name="", counter=0):
+        self._key = key
+        self.name = name
+        self.counter = int(counter)
+        super().__init__()
+
+    def seed(self, a=None, version=2):
+        # seeded by key; random.Random.__init__ calls this, ignore it
+        pass
+
+    def getrandbits(self, k):
+        out = 0
+        bits = 0
+        while bits < k:
+            h = hashlib.blake2b(
+                self.counter.to_bytes(8, "little"), key=self._key, digest_size=8
+            ).digest()
+            self.counter += 1
+            out = (out << 64) | int.from_bytes(h, "little")
+            bits += 64
+        return out >> (bits - k)
+
+    def random(self):
+        return self.getrandbits(53) * (1.0 / (1 << 53))
+
+    def getstate(self):
+        return self.counter
+
+    def setstate(self, state):
+        self.counter = int(state)
+
+    def __reduce__(self):
+        return (RNGStream, (self._key, self.name, self.counter))
+
+
+class RNGService:
+    """Named RNG streams derived from one campaign seed."""
+
+    def __init__(self, seed=None):
+        self.streams = {}
+        self._saved = {}  # stream name -> counter, applied on first use
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "little")
+        self.seed = int(seed)
+        self.streams = {}
+        self._saved = {}
+
+    def stream(self, name):
+        s = self.streams.get(name)
+        if s is None:
+            key = hashlib.sha256(f"{self.seed}:{name}".encode("utf-8")).digest()
+            s = RNGStream(key, name, self._saved.pop(name, 0))
+            self.streams[name] = s
+        return s
+
+    def token_stream(self, token):
+        return self.stream(f"token:{token.id}")
+
+    def next_seed(self, name="session"):
+        """64-bit seed for bulk generators (dice.roll_many, numpy)."""
+        return self.stream(name).getrandbits(64)
+
+    def to_json(self):
+        counters = dict(self._saved)
+        for name, s in self.streams.items():
+            if s.counter:
+                counters[name] = s.counter
+        return {"seed": self.seed, "streams": counters}
+
+    def load_from_json(self, data):
+        if not isinstance(data, dict):
+            return
+        try:
+            self.reseed(int(data.get("seed")))
+        except (TypeError, ValueError):
+            return
+        streams = data.get("streams", {})
+        if isinstance(streams, dict):
+            for name, counter in streams.items():
+                try:
+                    self._saved[str(name)] = int(counter)
+                except (TypeError, ValueError):
+                    pass
@@ -1,11 +1,157 @@
 import ast
+import marshal
+import multiprocessing
 import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import dice
+from rng import RNGService
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# tile trigger "type" -> event type that fires it
+TILE_TRIGGER_EVENTS = {
+    "onEnter": "onEnterTile",
+    "onLeave": "onLeaveTile",
+    "onInteract": "onInteractTile",
+}
+
+
+# Static size limits checked by _validate_ast
+MAX_SCRIPT_NODES = 1000
+MAX_POW_EXPONENT = 64
+MAX_REPEAT_COUNT = 1000
+MAX_CONST_LEN = 4096
+MAX_POW_BASE = 1 << 32  # largest literal base for ** and <<
+MAX_INT_BITS = 4096  # largest int a script may build (statically bounded)
+MAX_SEQ_LEN = 1 << 16  # longest str/list a script may build
+
+
+# Names a script may use and still run on a plain-data token snapshot in
+# a worker process (see RulesEngine.run_event_parallel)
+PURE_SCRIPT_NAMES = frozenset(
+    ("hp", "max_hp", "x", "y", "name", "tint", "event", "roll", "damage", "heal", "move", "set")
+)
 
 
 class ScriptSecurityError(Exception):
     pass
 
 
+class ScriptBudgetError(ScriptSecurityError):
+    """Script exceeds a size, time or memory budget."""
+    pass
+
+
+# ----------------------------------------------------------------------
+# Out-of-process sandbox (RulesEngine.sandbox == "process")
+# ----------------------------------------------------------------------
+
+
+def _sandbox_init(mem_limit_mb):
+    # Cap the worker's address space at its current size + mem_limit_mb.
+    if resource is None or not mem_limit_mb:
+        return
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[0]) * resource.getpagesize()
+        limit = current + int(mem_limit_mb) * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (OSError, ValueError):
+        pass
+
+
+def _sandbox_exec(code_bytes, env_vars, event, rng):
+    """
+    Run one compiled script on plain data in a worker process.
+    Returns (vars, said, triggered, rng state) or raises in the worker.
+    """
+    out, said, triggered = _exec_plain(marshal.loads(code_bytes), env_vars, event, rng)
+    return out, said, triggered, rng.getstate()
+
+
+def _exec_pure_chunk(scripts, jobs):
+    """
+    Worker side of run_event_parallel: scripts maps key -> marshalled code,
+    jobs is a list of (script keys, env vars, event, rng). Each job runs its
+    scripts in order on one env; returns
+    [(vars or None, error or None, rng state)].
+    """
+    codes = {key: marshal.loads(b) for key, b in scripts.items()}
+    results = []
+    for keys, env_vars, event, rng in jobs:
+        try:
+            for key in keys:
+                env_vars, _, _ = _exec_plain(codes[key], env_vars, event, rng)
+            results.append((env_vars, None, rng.getstate()))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}", rng.getstate()))
+    return results
+
+
+def _exec_plain(code, env_vars, event, rng=random):
+    env = dict(env_vars)
+    said = []
+    triggered = []
+
+    def roll_fn(n):
+        return _roll_value(n, rng)
+
+    def damage_fn(n):
+        try:
+            n = float(n)
+        except Exception:
+            n = 0.0
+        env["hp"] = max(0.0, env["hp"] - n)
+
+    def heal_fn(n):
+        try:
+            n = float(n)
+        except Exception:
+            n = 0.0
+        env["hp"] = min(env["max_hp"], env["hp"] + n)
+
+    def move_fn(dx, dy):
+        try:
+            dx = float(dx)
+            dy = float(dy)
+        except Exception:
+            dx = 0.0
+            dy = 0.0
+        env["x"] += dx
+        env["y"] += dy
+
+    def set_fn(var, value):
+        if isinstance(var, str):
+            env[var] = value
+
+    env.update(
+        roll=roll_fn,
+        damage=damage_fn,
+        heal=heal_fn,
+        move=move_fn,
+        say=lambda text: said.append(str(text)),
+        set=set_fn,
+        trigger=lambda name: triggered.append(str(name)),
+        token=None,
+        tile=None,
+        event=event,
+    )
+    exec(code, {"__builtins__": None}, env)
+    out = {k: env.get(k) for k in ("hp", "max_hp", "x", "y", "name", "tint")}
+    return out, said, triggered
+
+
 class RulesEngine:
     """
     Mini rule/scripting engine.
@@ -15,12 +161,75 @@ class RulesEngine:
     - Executes with a safe environment (no builtins).
     - Provides helper functions: roll, damage, heal, move, say, set, trigger.
     - Stores global scripts per event_type in self.global_scripts.
+    - Caches translated + validated + compiled scripts by source text
+      (bounded LRU, see cache_stats).
+    - Cascading events (trigger(), onHPChange, onDeath) are queued and run
+      breadth-first by process_queue() within a per-frame time budget.
+    - roll() draws from seeded per-token streams (self.rng), saved with the
+      rules, so a recorded event log replays with the same results.
     """
 
-    def __init__(self, say_callback=None, max_trigger_depth=3):
+    def __init__(
+        self,
+        say_callback=None,
+        max_trigger_depth=3,
+        cache_size=512,
+        frame_budget_ms=4.0,
+        rng=None,
+    ):
         self.say_callback = say_callback
         self.max_trigger_depth = max_trigger_depth
         self.global_scripts = {}  # event_type -> script string
+        self.rng = rng or RNGService()
+
+        # per-owner script timings, collected while self.profiling is on
+        self.profiling = False
+        self.script_stats = {}
+
+        # {"rng": ..., "events": [...]} while recording (see start_recording)
+        self.event_log = None
+        self._log_muted = 0
+
+        # script text -> code object (or the ScriptSecurityError it raised)
+        self.cache_size = cache_size
+        self._compiled = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0}
+
+        # queued (event_type, token, tile, event_data, depth) cascades
+        self.event_queue = deque()
+        self.frame_budget_ms = frame_budget_ms
+        self.queue_stats = {"processed": 0, "carried_over": 0, "peak": 0}
+
+        # Script budgets. "inline" relies on the static checks in
+        # _validate_ast (node count and value size bounds); "process" also runs each script in a worker process
+        # with a hard timeout and memory cap.
+        self.sandbox = "inline"
+        self.script_timeout_s = 0.25
+        self.script_mem_limit_mb = 128
+        self._sandbox_pool = None
+        self.budget_violations = deque(maxlen=100)
+
+        # worker pool for run_event_parallel and the purity verdict per script
+        self._process_pool = None
+        self._process_workers = 0
+        self._pure = {}
+
+        # Future of the last precompile_async() call (result: invalid-script report)
+        self.precompile_future = None
+
+        # helper functions shared by every script run; they operate on the
+        # innermost entry of self._frames (env, token, tile, event, depth)
+        self._frames = []
+        self._helpers = {
+            "roll": self._roll_fn,
+            "damage": self._damage_fn,
+            "heal": self._heal_fn,
+            "move": self._move_fn,
+            "say": self._say_fn,
+            "set": self._set_fn,
+            "trigger": self._trigger_fn,
+        }
 
     # ------------------------------------------------------------------
     # PUBLIC API
@@ -35,9 +244,21 @@ class RulesEngine:
         3) global_scripts[event_type]
 
         event_data is an optional dict with extra info.
+        Follow-up events raised by these scripts are queued, not run here.
         """
         if depth > self.max_trigger_depth:
             return
+        if not self.has_listeners(event_type, token, tile):
+            return
+        if depth == 0 and self.event_log is not None and not self._log_muted:
+            self.event_log["events"].append(
+                {
+                    "type": event_type,
+                    "token": token.id if token is not None else None,
+                    "tile": [tile.x, tile.y] if tile is not None else None,
+                    "data": event_data or {},
+                }
+            )
 
         event = {
             "type": event_type,
@@ -48,7 +269,8 @@ class RulesEngine:
         if token is not None and getattr(token, "scripts", None):
             script = token.scripts.get(event_type)
             if script:
-                self._run_single_script(script, token, tile, event, depth)
+                owner = f"token:{token.id}:{event_type}"
+                self._run_single_script(script, token, tile, event, depth, owner)
 
         # tile trigger (for tile events only)
         if tile is not None:
@@ -59,27 +281,391 @@ class RulesEngine:
                 once = bool(trigger.get("once", False))
                 fired = bool(trigger.get("fired", False))
 
-                # Map tile trigger type to event types
-                # "onEnter"  -> event_type == "onEnterTile"
-                # "onLeave"  -> event_type == "onLeaveTile"
-                # "onInteract" -> event_type == "onInteractTile"
-                match = False
-                if trig_type == "onEnter" and event_type == "onEnterTile":
-                    match = True
-                elif trig_type == "onLeave" and event_type == "onLeaveTile":
-                    match = True
-                elif trig_type == "onInteract" and event_type == "onInteractTile":
-                    match = True
+                # Map tile trigger type to event types (see TILE_TRIGGER_EVENTS)
+                match = TILE_TRIGGER_EVENTS.get(trig_type) == event_type
 
                 if match and trig_script and (not once or not fired):
-                    self._run_single_script(trig_script, token, tile, event, depth)
+                    owner = f"tile:{tile.x},{tile.y}:{event_type}"
+                    self._run_single_script(trig_script, token, tile, event, depth, owner)
                     if once:
                         trigger["fired"] = True
 
         # global scripts
         script = self.global_scripts.get(event_type)
         if script:
-            self._run_single_script(script, token, tile, event, depth)
+            owner = f"global:{event_type}"
+            self._run_single_script(script, token, tile, event, depth, owner)
+
+    def queue_event(self, event_type, token=None, tile=None, event_data=None, depth=0):
+        """Schedule an event for the next process_queue() call."""
+        if depth > self.max_trigger_depth:
+            return
+        if not self.has_listeners(event_type, token, tile):
+            return
+        self.event_queue.append((event_type, token, tile, event_data, depth))
+        if len(self.event_queue) > self.queue_stats["peak"]:
+            self.queue_stats["peak"] = len(self.event_queue)
+
+    def process_queue(self, budget_ms=None):
+        """
+        Run queued events breadth-first until the queue is empty or the time
+        budget (default self.frame_budget_ms) is spent; the rest carries over
+        to the next call. At least one event runs per call. Returns the
+        number of events processed.
+        """
+        if not self.event_queue:
+            return 0
+        budget_ms = self.frame_budget_ms if budget_ms is None else budget_ms
+        deadline = time.perf_counter() + budget_ms / 1000.0
+
+        done = 0
+        while self.event_queue:
+            event_type, token, tile, event_data, depth = self.event_queue.popleft()
+            self.run_event(event_type, token, tile, event_data, depth)
+            done += 1
+            if time.perf_counter() >= deadline:
+                break
+
+        self.queue_stats["processed"] += done
+        if self.event_queue:
+            self.queue_stats["carried_over"] += 1
+        return done
+
+    def queue_length(self):
+        return len(self.event_queue)
+
+    def run_event_batch(self, event_type, tokens, event_data=None):
+        """
+        Fire one event for a group of tokens (bulk spawn, batch actions,
+        turn ticks). Every token sees the same event data, with
+        "batch_size" added.
+
+        Tokens are grouped by script text: each group compiles once and
+        reuses one env, token scripts run before the global script, and
+        onHPChange/onDeath follow-ups are queued together at the end.
+        """
+        tokens = list(tokens)
+        data = dict(event_data or {})
+        data["batch_size"] = len(tokens)
+        self._log_batch(event_type, tokens, event_data)
+        if self.sandbox == "process":
+            self._log_muted += 1
+            try:
+                for token in tokens:
+                    self.run_event(event_type, token, None, data)
+            finally:
+                self._log_muted -= 1
+            return
+
+        event = {"type": event_type, "data": data}
+        groups = {}  # script text -> tokens, in first-seen order
+        for token in tokens:
+            script = (getattr(token, "scripts", None) or {}).get(event_type)
+            if script and script.strip():
+                groups.setdefault(script, []).append(token)
+
+        old_hp = {}  # token -> hp before its first script in this batch
+        try:
+            for script, group in groups.items():
+                self._run_script_group(script, group, event, f"token:*:{event_type}", old_hp)
+            script = self.global_scripts.get(event_type)
+            if script and script.strip():
+                self._run_script_group(script, tokens, event, f"global:{event_type}", old_hp)
+        finally:
+            # tokens already changed keep their follow-ups even if a later
+            # group raised (e.g. ScriptSecurityError while compiling)
+            changed = [t for t, hp in old_hp.items() if t.hp != hp]
+            for token in changed:
+                self.queue_event("onHPChange", token, None, data, 1)
+            for token in changed:
+                if token.hp <= 0:
+                    self.queue_event("onDeath", token, None, data, 1)
+
+    def _run_script_group(self, script, tokens, event, owner, old_hp):
+        """Run one script over many tokens, reusing a single env dict."""
+        profiling = self.profiling
+        if profiling:
+            misses = self.cache_stats["misses"]
+        code = self.compile_script(script)
+        hit = not profiling or self.cache_stats["misses"] == misses
+        env = self._make_env(None, None, event)
+        base_keys = set(env)
+
+        frame = [env, None, None, event, 0]
+        self._frames.append(frame)
+        try:
+            for token in tokens:
+                # drop script locals left over from the previous token and
+                # restore anything it rebound (roll = 3, set("event", ...))
+                if len(env) > len(base_keys):
+                    for k in [k for k in env if k not in base_keys]:
+                        del env[k]
+                env.update(self._helpers)
+                self._fill_env(env, token)
+                # own shallow copy per token: event["data"]["x"] = ... in one
+                # token's script must not leak into the next one
+                token_event = {"type": event["type"], "data": dict(event["data"])}
+                env["token"] = token
+                env["tile"] = None
+                env["event"] = token_event
+                frame[1] = token
+                frame[3] = token_event
+                old_hp.setdefault(token, token.hp)
+                start = time.perf_counter() if profiling else 0.0
+                try:
+                    exec(code, {"__builtins__": None}, env)
+                except (MemoryError, OverflowError) as e:
+                    self._report_budget(
+                        owner.replace("*", str(token.id)), script, f"{type(e).__name__}: {e}"
+                    )
+                    continue
+                except Exception as e:
+                    # one broken token must not stop the rest of the batch
+                    print(
+                        f"[WARNING] Script {owner.replace('*', str(token.id))} failed: "
+                        f"{type(e).__name__}: {e}"
+                    )
+                    continue
+                if profiling:
+                    # the compile (hit or miss) is charged to the first token
+                    self._profile(owner.replace("*", str(token.id)), time.perf_counter() - start, hit)
+                    hit = True
+                self._apply_env(token, env)
+        finally:
+            self._frames.pop()
+
+    def run_event_parallel(self, event_type, tokens, event_data=None, workers=None, chunk_size=250):
+        """
+        Like run_event over many tokens, but pure token/global scripts run
+        in a process pool on plain-data snapshots; results are applied to
+        the tokens here, on the calling thread. Tokens with an impure
+        script (say, trigger, token/tile access) run inline as usual.
+        Returns the number of tokens that ran in the pool.
+        """
+        tokens = list(tokens)
+        event = {"type": event_type, "data": dict(event_data or {})}
+        global_script = self.global_scripts.get(event_type) or ""
+        self._log_batch(event_type, tokens, event_data, parallel=True)
+
+        scripts = {}  # script text -> key
+        jobs = []
+        job_tokens = []
+        for token in tokens:
+            if not self.has_listeners(event_type, token):
+                continue
+            texts = [(getattr(token, "scripts", None) or {}).get(event_type) or "", global_script]
+            texts = [t for t in texts if t.strip()]
+            if not all(self.is_pure_script(t) for t in texts):
+                self._log_muted += 1
+                try:
+                    self.run_event(event_type, token, None, event["data"])
+                finally:
+                    self._log_muted -= 1
+                continue
+            keys = tuple(scripts.setdefault(t, len(scripts)) for t in texts)
+            env = self._make_env(token, None, event)
+            env_vars = {k: env[k] for k in ("hp", "max_hp", "x", "y", "name", "tint")}
+            jobs.append((keys, env_vars, event, self.rng.token_stream(token)))
+            job_tokens.append(token)
+
+        if not jobs:
+            return 0
+
+        start = time.perf_counter()
+        packed = {key: marshal.dumps(self.compile_script(t)) for t, key in scripts.items()}
+        pool = self._get_process_pool(workers)
+        futures = [
+            pool.submit(_exec_pure_chunk, packed, jobs[i : i + chunk_size])
+            for i in range(0, len(jobs), chunk_size)
+        ]
+
+        i = 0
+        for fut in futures:
+            for out, error, rng_state in fut.result():
+                token = job_tokens[i]
+                i += 1
+                self.rng.token_stream(token).setstate(rng_state)
+                if error is not None:
+                    print(f"[WARNING] Script token:{token.id}:{event_type} failed: {error}")
+                    continue
+                old_hp = token.hp
+                self._apply_env(token, out)
+                if token.hp != old_hp:
+                    self.queue_event("onHPChange", token, None, event["data"], 1)
+                if token.hp <= 0:
+                    self.queue_event("onDeath", token, None, event["data"], 1)
+        if self.profiling:
+            # per-script times stay in the workers; record the whole run
+            self._profile(f"parallel:{event_type}", time.perf_counter() - start, True)
+        return len(jobs)
+
+    # ------------------------------------------------------------------
+    # SCRIPT PROFILING
+    # ------------------------------------------------------------------
+
+    def _profile(self, owner, seconds, hit):
+        st = self.script_stats.get(owner)
+        if st is None:
+            st = {"owner": owner, "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "hits": 0, "misses": 0}
+            self.script_stats[owner] = st
+        ms = seconds * 1000.0
+        st["calls"] += 1
+        st["total_ms"] += ms
+        if ms > st["max_ms"]:
+            st["max_ms"] = ms
+        if hit:
+            st["hits"] += 1
+        else:
+            st["misses"] += 1
+
+    def profile_report(self, sort_by="total_ms", limit=None):
+        """
+        Per-owner script stats, most expensive first. Each row has owner,
+        calls, total_ms, max_ms, avg_ms and hit_rate (compiled-cache hits).
+        """
+        rows = []
+        for st in self.script_stats.values():
+            row = dict(st)
+            row["avg_ms"] = st["total_ms"] / st["calls"] if st["calls"] else 0.0
+            row["hit_rate"] = st["hits"] / st["calls"] if st["calls"] else 0.0
+            rows.append(row)
+        rows.sort(key=lambda r: r.get(sort_by, 0), reverse=True)
+        return rows[:limit] if limit else rows
+
+    def profile_lines(self, limit=10, sort_by="total_ms"):
+        """profile_report() as fixed-width text lines (header first)."""
+        lines = [f"{'script':<28}{'calls':>7}{'total ms':>10}{'max ms':>9}{'hit %':>7}"]
+        for r in self.profile_report(sort_by, limit):
+            owner = r["owner"] if len(r["owner"]) <= 27 else r["owner"][:24] + "..."
+            lines.append(
+                f"{owner:<28}{r['calls']:>7}{r['total_ms']:>10.2f}"
+                f"{r['max_ms']:>9.2f}{r['hit_rate'] * 100:>7.0f}"
+            )
+        return lines
+
+    def reset_profile(self):
+        self.script_stats = {}
+
+    # ------------------------------------------------------------------
+    # EVENT LOG / REPLAY
+    # ------------------------------------------------------------------
+
+    def start_recording(self):
+        """
+        Record top-level events (not queued follow-ups) from now on,
+        together with the current RNG state.
+        """
+        self.event_log = {"rng": self.rng.to_json(), "events": []}
+
+    def stop_recording(self):
+        """Stop recording and return the log (JSON-serializable)."""
+        log, self.event_log = self.event_log, None
+        return log
+
+    def _log_batch(self, event_type, tokens, event_data, parallel=False):
+        if self.event_log is None or self._log_muted:
+            return
+        self.event_log["events"].append(
+            {
+                "type": event_type,
+                "tokens": [t.id for t in tokens],
+                "data": event_data or {},
+                "batch": "parallel" if parallel else "batch",
+            }
+        )
+
+    def replay(self, log, tokens=(), tilemap=None):
+        """
+        Re-run a recorded log against tokens/tilemap restored to the state
+        they had when recording started. The RNG is reset to the recorded
+        state and the queue is drained after every event, so the same
+        scripts give the same rolls. Returns the number of events replayed.
+        """
+        by_id = {t.id: t for t in tokens}
+        self.rng.load_from_json(log.get("rng"))
+        self.event_queue.clear()
+        done = 0
+        for entry in log.get("events", []):
+            event_type = entry.get("type")
+            data = entry.get("data") or {}
+            if "tokens" in entry:
+                batch = [by_id[i] for i in entry["tokens"] if i in by_id]
+                if entry.get("batch") == "parallel":
+                    self.run_event_parallel(event_type, batch, data)
+                else:
+                    self.run_event_batch(event_type, batch, data)
+            else:
+                token = by_id.get(entry.get("token"))
+                tile = None
+                if entry.get("tile") is not None and tilemap is not None:
+                    tile = tilemap.get_tile(*entry["tile"])
+                self.run_event(event_type, token, tile, data)
+            while self.event_queue:
+                self.process_queue(budget_ms=float("inf"))
+            done += 1
+        return done
+
+    def is_pure_script(self, script):
+        """True if the script only touches env variables and pure helpers."""
+        pure = self._pure.get(script)
+        if pure is None:
+            try:
+                self.compile_script(script)
+                tree = ast.parse(self._to_python_code(script), mode="exec")
+            except (ScriptSecurityError, SyntaxError):
+                pure = False
+            else:
+                assigned = {
+                    n.id
+                    for n in ast.walk(tree)
+                    if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)
+                }
+                pure = all(
+                    n.id in PURE_SCRIPT_NAMES or n.id in assigned
+                    for n in ast.walk(tree)
+                    if isinstance(n, ast.Name)
+                )
+            if len(self._pure) >= self.cache_size:
+                self._pure.clear()
+            self._pure[script] = pure
+        return pure
+
+    def _get_process_pool(self, workers=None):
+        workers = workers or multiprocessing.cpu_count()
+        if self._process_pool is not None and self._process_workers != workers:
+            self._process_pool.shutdown()
+            self._process_pool = None
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=workers)
+            self._process_workers = workers
+        return self._process_pool
+
+    # ------------------------------------------------------------------
+    # LISTENERS
+    # ------------------------------------------------------------------
+
+    def has_listeners(self, event_type, token=None, tile=None):
+        """
+        True if a global, token or tile script is bound to event_type.
+        Reads token.scripts and tile.trigger directly, so there is nothing
+        to keep in sync when scripts are edited or tokens arrive.
+        """
+        if self.global_scripts.get(event_type):
+            return True
+        if token is not None:
+            script = (getattr(token, "scripts", None) or {}).get(event_type)
+            if script and script.strip():
+                return True
+        if tile is not None:
+            trigger = getattr(tile, "trigger", None)
+            if (
+                isinstance(trigger, dict)
+                and TILE_TRIGGER_EVENTS.get(trigger.get("type")) == event_type
+                and trigger.get("script")
+                and not (trigger.get("once") and trigger.get("fired"))
+            ):
+                return True
+        return False
 
     def set_global_script(self, event_type, script):
         self.global_scripts[event_type] = script or ""
@@ -87,6 +673,7 @@ class RulesEngine:
     def to_json(self):
         return {
             "global": dict(self.global_scripts),
+            "rng": self.rng.to_json(),
         }
 
     def load_from_json(self, data):
@@ -95,36 +682,79 @@ class RulesEngine:
         g = data.get("global", {})
         if isinstance(g, dict):
             self.global_scripts = dict(g)
+        if "rng" in data:
+            self.rng.load_from_json(data["rng"])
 
     # ------------------------------------------------------------------
     # INTERNAL: script execution pipeline
     # ------------------------------------------------------------------
 
-    def _run_single_script(self, script, token, tile, event, depth):
+    def _run_single_script(self, script, token, tile, event, depth, owner=""):
         script = script or ""
         if not script.strip():
             return
 
-        # Prepare environment
-        env = {}
-        env_token = token
-        env_tile = tile
-        env_event = event
+        profiling = self.profiling
+        if profiling:
+            misses = self.cache_stats["misses"]
+            start = time.perf_counter()
+
+        # Translated, validated and compiled once per distinct script text
+        code = self.compile_script(script)
+
+        env = self._make_env(token, tile, event)
+        old_hp = env["hp"]
+
+        if self.sandbox == "process":
+            if not self._exec_in_sandbox(script, code, env, token, tile, event, depth, owner):
+                return
+        else:
+            # helpers act on the innermost running script (trigger() nests)
+            self._frames.append((env, token, tile, event, depth))
+            try:
+                exec(code, {"__builtins__": None}, env)  # no builtins, restricted env
+            except (MemoryError, OverflowError) as e:
+                self._report_budget(owner, script, f"{type(e).__name__}: {e}")
+                return
+            finally:
+                self._frames.pop()
+
+        if profiling:
+            self._profile(owner, time.perf_counter() - start, self.cache_stats["misses"] == misses)
+
+        # propagate back to token
+        if token is not None:
+            self._apply_env(token, env)
+
+            # onHPChange / onDeath triggers
+            if token.hp != int(old_hp):
+                self.queue_event("onHPChange", token, tile, event["data"], depth + 1)
+            if token.hp <= 0:
+                self.queue_event("onDeath", token, tile, event["data"], depth + 1)
+
+    def _make_env(self, token, tile, event):
+        # copy of the prebuilt helper table, then the per-token variables
+        env = dict(self._helpers)
+        self._fill_env(env, token)
+        env["token"] = token
+        env["tile"] = tile
+        env["event"] = event
+        return env
 
-        # Bind basic vars from token
-        if env_token is not None:
+    def _fill_env(self, env, token):
+        if token is not None:
             try:
-                env["hp"] = float(env_token.hp)
+                env["hp"] = float(token.hp)
             except Exception:
                 env["hp"] = 0.0
             try:
-                env["max_hp"] = float(env_token.max_hp)
+                env["max_hp"] = float(token.max_hp)
             except Exception:
                 env["max_hp"] = env["hp"]
-            env["x"] = float(env_token.x)
-            env["y"] = float(env_token.y)
-            env["name"] = str(env_token.name)
-            tnt = getattr(env_token, "tint", (1.0, 1.0, 1.0))
+            env["x"] = float(token.x)
+            env["y"] = float(token.y)
+            env["name"] = str(token.name)
+            tnt = getattr(token, "tint", (1.0, 1.0, 1.0))
             if not isinstance(tnt, (list, tuple)) or len(tnt) != 3:
                 tnt = (1.0, 1.0, 1.0)
             env["tint"] = [float(tnt[0]), float(tnt[1]), float(tnt[2])]
@@ -136,125 +766,290 @@ class RulesEngine:
             env["name"] = ""
             env["tint"] = [1.0, 1.0, 1.0]
 
-        env["token"] = env_token
-        env["tile"] = env_tile
-        env["event"] = env_event
+    def _apply_env(self, token, env):
+        try:
+            token.x = float(env.get("x", token.x))
+            token.y = float(env.get("y", token.y))
+        except Exception:
+            pass
 
-        # Functions
-        def roll_fn(n):
-            try:
-                n = int(n)
-            except Exception:
-                n = 1
-            if n < 1:
-                n = 1
-            return random.randint(1, n)
+        try:
+            new_hp = float(env.get("hp", token.hp))
+        except Exception:
+            new_hp = token.hp
+        try:
+            new_max_hp = float(env.get("max_hp", token.max_hp))
+        except Exception:
+            new_max_hp = token.max_hp
+        if new_max_hp < 1:
+            new_max_hp = 1.0
+        if new_hp < 0:
+            new_hp = 0.0
+        if new_hp > new_max_hp:
+            new_hp = new_max_hp
+        token.max_hp = int(new_max_hp)
+        token.hp = int(new_hp)
 
-        def damage_fn(n):
+        # tint
+        t = env.get("tint", token.tint)
+        if isinstance(t, (list, tuple)) and len(t) == 3:
             try:
-                n = float(n)
+                r = float(t[0])
+                g = float(t[1])
+                b = float(t[2])
             except Exception:
-                n = 0.0
-            env["hp"] = max(0.0, env["hp"] - n)
+                r, g, b = 1.0, 1.0, 1.0
+            token.tint = (
+                max(0.0, min(1.0, r)),
+                max(0.0, min(1.0, g)),
+                max(0.0, min(1.0, b)),
+            )
 
-        def heal_fn(n):
-            try:
-                n = float(n)
-            except Exception:
-                n = 0.0
-            env["hp"] = min(env["max_hp"], env["hp"] + n)
+    # ------------------------------------------------------------------
+    # SANDBOX / BUDGETS
+    # ------------------------------------------------------------------
 
-        def move_fn(dx, dy):
-            try:
-                dx = float(dx)
-                dy = float(dy)
-            except Exception:
-                dx = 0.0
-                dy = 0.0
-            env["x"] += dx
-            env["y"] += dy
-
-        def say_fn(text):
-            msg = str(text)
-            if self.say_callback:
-                self.say_callback(msg)
-            else:
-                print(f"[SAY] {msg}")
+    def _get_sandbox_pool(self):
+        if self._sandbox_pool is None:
+            self._sandbox_pool = multiprocessing.get_context().Pool(
+                1,
+                initializer=_sandbox_init,
+                initargs=(self.script_mem_limit_mb,),
+            )
+        return self._sandbox_pool
 
-        def set_fn(var, value):
-            if not isinstance(var, str):
-                return
-            env[var] = value
+    def _exec_in_sandbox(self, script, code, env, token, tile, event, depth, owner):
+        """
+        Run `code` in the worker process on a plain-data copy of env and
+        merge the result back into env. Returns False if the script was
+        stopped (timeout, memory, error) and reported instead.
+        """
+        env_vars = {k: env[k] for k in ("hp", "max_hp", "x", "y", "name", "tint")}
+        try:
+            job = self._get_sandbox_pool().apply_async(
+                _sandbox_exec,
+                (
+                    marshal.dumps(code),
+                    env_vars,
+                    {"type": event["type"], "data": event["data"]},
+                    self._script_stream(token, event),
+                ),
+            )
+            out, said, triggered, rng_state = job.get(self.script_timeout_s)
+        except multiprocessing.TimeoutError:
+            # the worker is stuck inside the script: kill it, start fresh next time
+            self._sandbox_pool.terminate()
+            self._sandbox_pool = None
+            self._report_budget(owner, script, f"timed out after {self.script_timeout_s:.2f}s")
+            return False
+        except MemoryError:
+            self._report_budget(owner, script, f"exceeded {self.script_mem_limit_mb} MB")
+            return False
+        except Exception as e:
+            self._report_budget(owner, script, f"{type(e).__name__}: {e}")
+            return False
 
-        def trigger_fn(name):
-            # trigger("onDeath") etc.
-            name = str(name)
-            self.run_event(name, env_token, env_tile, env_event["data"], depth + 1)
+        self._script_stream(token, event).setstate(rng_state)
+        env.update(out)
+        for msg in said:
+            self._say_fn(msg)
+        for name in triggered:
+            self.queue_event(name, token, tile, event["data"], depth + 1)
+        return True
+
+    def _report_budget(self, owner, script, error):
+        entry = {"owner": owner, "script": script, "error": error}
+        self.budget_violations.append(entry)
+        print(f"[WARNING] Script {owner or '?'} stopped: {error}")
+
+    def close(self):
+        """Shut down the sandbox worker and script pool, if started."""
+        if self._sandbox_pool is not None:
+            self._sandbox_pool.terminate()
+            self._sandbox_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
+
+    # ------------------------------------------------------------------
+    # SCRIPT HELPERS (bound once, see self._helpers)
+    # ------------------------------------------------------------------
+
+    def _roll_fn(self, n):
+        _, token, _, event, _ = self._frames[-1]
+        return _roll_value(n, self._script_stream(token, event))
+
+    def _script_stream(self, token, event):
+        if token is not None:
+            return self.rng.token_stream(token)
+        return self.rng.stream(f"global:{event['type']}")
 
-        env["roll"] = roll_fn
-        env["damage"] = damage_fn
-        env["heal"] = heal_fn
-        env["move"] = move_fn
-        env["say"] = say_fn
-        env["set"] = set_fn
-        env["trigger"] = trigger_fn
+    def _damage_fn(self, n):
+        env = self._frames[-1][0]
+        try:
+            n = float(n)
+        except Exception:
+            n = 0.0
+        env["hp"] = max(0.0, env["hp"] - n)
+
+    def _heal_fn(self, n):
+        env = self._frames[-1][0]
+        try:
+            n = float(n)
+        except Exception:
+            n = 0.0
+        env["hp"] = min(env["max_hp"], env["hp"] + n)
+
+    def _move_fn(self, dx, dy):
+        env = self._frames[-1][0]
+        try:
+            dx = float(dx)
+            dy = float(dy)
+        except Exception:
+            dx = 0.0
+            dy = 0.0
+        env["x"] += dx
+        env["y"] += dy
+
+    def _say_fn(self, text):
+        msg = str(text)
+        if self.say_callback:
+            self.say_callback(msg)
+        else:
+            print(f"[SAY] {msg}")
 
-        # Build safe environment (no builtins)
-        globals_dict = {"__builtins__": None}
-        locals_dict = env
+    def _set_fn(self, var, value):
+        if not isinstance(var, str):
+            return
+        self._frames[-1][0][var] = value
 
-        # Translate mini-lang to Python, validate AST, execute
+    def _trigger_fn(self, name):
+        # trigger("onDeath") etc. -- runs after this script, via the queue
+        _, token, tile, event, depth = self._frames[-1]
+        self.queue_event(str(name), token, tile, event["data"], depth + 1)
+
+    # ------------------------------------------------------------------
+    # COMPILED SCRIPT CACHE
+    # ------------------------------------------------------------------
+
+    def compile_script(self, script):
+        """
+        Return the compiled code object for a mini-lang script, translating
+        and validating it only on a cache miss. Invalid scripts are cached
+        too, and raise the same ScriptSecurityError on every call.
+        """
+        with self._cache_lock:
+            cached = self._compiled.get(script)
+            if cached is not None:
+                self._compiled.move_to_end(script)
+                self.cache_stats["hits"] += 1
+            else:
+                self.cache_stats["misses"] += 1
+
+        if cached is None:
+            cached = self._build_code(script)
+            with self._cache_lock:
+                self._compiled[script] = cached
+                if len(self._compiled) > self.cache_size:
+                    self._compiled.popitem(last=False)
+
+        if isinstance(cached, ScriptSecurityError):
+            raise type(cached)(str(cached))
+        return cached
+
+    def _build_code(self, script):
         py_code = self._to_python_code(script)
-        self._validate_ast(py_code)
-        old_hp = env["hp"]
-        exec(py_code, globals_dict, locals_dict)  # no builtins, restricted env
+        try:
+            self._validate_ast(py_code)
+            return compile(py_code, "<script>", "exec")
+        except ScriptSecurityError as e:
+            return e
 
-        # propagate back to token
-        if env_token is not None:
-            try:
-                env_token.x = float(env.get("x", env_token.x))
-                env_token.y = float(env.get("y", env_token.y))
-            except Exception:
-                pass
+    def clear_script_cache(self):
+        with self._cache_lock:
+            self._compiled.clear()
+            self.cache_stats = {"hits": 0, "misses": 0}
+        self._pure.clear()
 
-            try:
-                new_hp = float(env.get("hp", env_token.hp))
-            except Exception:
-                new_hp = env_token.hp
-            try:
-                new_max_hp = float(env.get("max_hp", env_token.max_hp))
-            except Exception:
-                new_max_hp = env_token.max_hp
-            if new_max_hp < 1:
-                new_max_hp = 1.0
-            if new_hp < 0:
-                new_hp = 0.0
-            if new_hp > new_max_hp:
-                new_hp = new_max_hp
-            env_token.max_hp = int(new_max_hp)
-            env_token.hp = int(new_hp)
-
-            # tint
-            t = env.get("tint", env_token.tint)
-            if isinstance(t, (list, tuple)) and len(t) == 3:
-                try:
-                    r = float(t[0])
-                    g = float(t[1])
-                    b = float(t[2])
-                except Exception:
-                    r, g, b = 1.0, 1.0, 1.0
-                env_token.tint = (
-                    max(0.0, min(1.0, r)),
-                    max(0.0, min(1.0, g)),
-                    max(0.0, min(1.0, b)),
-                )
+    # ------------------------------------------------------------------
+    # PRECOMPILATION (campaign load)
+    # ------------------------------------------------------------------
+
+    def iter_scripts(self, tokens=(), tilemap=None):
+        """
+        Yield (location, script) for every non-empty script in the campaign.
+        location is a dict such as
+            {"kind": "token", "id": ..., "name": ..., "event": "onMove"}
+            {"kind": "tile", "x": 3, "y": 4, "event": "onEnter"}
+            {"kind": "global", "event": "onTurn"}
+        """
+        for t in tokens:
+            for event_type, script in (getattr(t, "scripts", None) or {}).items():
+                if script and script.strip():
+                    yield {
+                        "kind": "token",
+                        "id": t.id,
+                        "name": t.name,
+                        "event": event_type,
+                    }, script
+
+        if tilemap is not None:
+            for (tx, ty), tile in tilemap.tiles.items():
+                trigger = tile.trigger
+                if not isinstance(trigger, dict):
+                    continue
+                script = trigger.get("script")
+                if script and script.strip():
+                    yield {
+                        "kind": "tile",
+                        "x": tx,
+                        "y": ty,
+                        "event": trigger.get("type"),
+                    }, script
+
+        for event_type, script in self.global_scripts.items():
+            if script and script.strip():
+                yield {"kind": "global", "event": event_type}, script
+
+    def precompile(self, tokens=(), tilemap=None, workers=4, scripts=None):
+        """
+        Compile every campaign script into the cache using a thread pool and
+        return a report of the invalid ones:
+            [{"location": {...}, "error": "..."}]
+        """
+        if scripts is None:
+            scripts = list(self.iter_scripts(tokens, tilemap))
+
+        distinct = list({script for _, script in scripts})
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = dict(zip(distinct, pool.map(self._build_code, distinct)))
 
-        # onHPChange / onDeath triggers
-        if env_token is not None:
-            if env_token.hp != int(old_hp):
-                self.run_event("onHPChange", env_token, env_tile, env_event["data"], depth + 1)
-            if env_token.hp <= 0:
-                self.run_event("onDeath", env_token, env_tile, env_event["data"], depth + 1)
+        with self._cache_lock:
+            for script, code in results.items():
+                self._compiled[script] = code
+                self._compiled.move_to_end(script)
+            while len(self._compiled) > self.cache_size:
+                self._compiled.popitem(last=False)
+
+        report = []
+        for location, script in scripts:
+            code = results[script]
+            if isinstance(code, ScriptSecurityError):
+                report.append({"location": location, "error": str(code)})
+        return report
+
+    def precompile_async(self, tokens=(), tilemap=None, workers=4):
+        """
+        Like precompile(), but runs in the background. The script list is
+        collected immediately; the returned Future (also kept in
+        self.precompile_future) resolves to the invalid-script report.
+        """
+        scripts = list(self.iter_scripts(tokens, tilemap))
+        runner = ThreadPoolExecutor(max_workers=1)
+        future = runner.submit(self.precompile, workers=workers, scripts=scripts)
+        runner.shutdown(wait=False)
+        self.precompile_future = future
+        return future
 
     # ------------------------------------------------------------------
     # MINI-LANG -> PYTHON TRANSLATION
@@ -332,6 +1127,11 @@ class RulesEngine:
             ast.keyword,
             ast.Tuple,
             ast.List,
+            # operators (size-checked below)
+            ast.operator,
+            ast.unaryop,
+            ast.boolop,
+            ast.cmpop,
         )
 
         forbidden = (
@@ -359,10 +1159,344 @@ class RulesEngine:
             ast.YieldFrom,
         )
 
+        count = 0
         for node in ast.walk(tree):
             if isinstance(node, forbidden):
                 raise ScriptSecurityError(f"Forbidden construct: {type(node).__name__}")
             if not isinstance(node, allowed_nodes):
                 raise ScriptSecurityError(f"Disallowed AST node: {type(node).__name__}")
+            count += 1
+            if count > MAX_SCRIPT_NODES:
+                raise ScriptBudgetError(f"Script too large (>{MAX_SCRIPT_NODES} nodes)")
+            self._check_node_size(node)
+
+        _check_value_sizes(tree)
+        return True
+
+    def _check_node_size(self, node):
+        """Reject expressions whose result size is unbounded at a glance."""
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, (str, bytes)) and len(node.value) > MAX_CONST_LEN:
+                raise ScriptBudgetError("String constant too long")
+            return
+
+        if not isinstance(node, ast.BinOp):
+            return
+
+        if isinstance(node.op, (ast.Pow, ast.LShift)):
+            # 9**9**9, 1 << 10**9: exponent/shift must be a small literal
+            n = _const_number(node.right)
+            if n is None or abs(n) > MAX_POW_EXPONENT:
+                raise ScriptBudgetError(
+                    f"Exponent must be a literal of at most {MAX_POW_EXPONENT}"
+                )
+            # (9**64)**64: the base must not be a power itself; names and
+            # calls are bounded by _check_value_sizes
+            base = _const_number(node.left)
+            if isinstance(node.left, ast.BinOp) or (base is not None and abs(base) > MAX_POW_BASE):
+                raise ScriptBudgetError(f"Base must be a literal of at most {MAX_POW_BASE}")
+
+        elif isinstance(node.op, ast.Mod):
+            # "%0999999999d" % 1
+            if isinstance(node.left, ast.Constant) and isinstance(node.left.value, (str, bytes)):
+                raise ScriptBudgetError("String formatting with % is not allowed")
+
+        elif isinstance(node.op, ast.Mult):
+            # [0] * 10**9, "a" * 10**9, tint * 10**9, [0] * 1000 * 1000
+            for seq, count in ((node.left, node.right), (node.right, node.left)):
+                if isinstance(seq, ast.BinOp) and _has_sequence_operand(seq):
+                    raise ScriptBudgetError("Repeated sequences cannot be repeated again")
+                if _is_sequence_literal(seq):
+                    n = _const_number(count)
+                    if n is None or n > MAX_REPEAT_COUNT:
+                        raise ScriptBudgetError(
+                            f"Sequence repeat must be a literal of at most {MAX_REPEAT_COUNT}"
+                        )
+                n = _const_number(count)
+                if n is not None and n > MAX_REPEAT_COUNT and _const_number(seq) is None:
+                    raise ScriptBudgetError(
+                        f"Repeat count above {MAX_REPEAT_COUNT} needs a numeric operand"
+                    )
+
+
+# ----------------------------------------------------------------------
+# VALUE SIZE BOUNDS
+#
+# Scripts have no loops, so run time is bounded by the node count as long
+# as no single value gets huge. _check_value_sizes walks the statements in
+# order with an upper bound per name -- (kinds, length, bits): kinds is a
+# set of "int", "float", "str", "seq" and "other" (anything), length the
+# longest str/list in the value, bits the largest int in it -- so a = 9**64; b = a**64 or
+# s = "ab" * 1000; t = s * 1000 is rejected before it runs.
+# ----------------------------------------------------------------------
+
+_INT = frozenset(("int",))
+_FLOAT = frozenset(("float",))
+_STR = frozenset(("str",))
+_SEQ = frozenset(("seq",))
+_OTHER = frozenset(("other",))
+_NUMBERS = _INT | _FLOAT
+_SEQUENCES = _STR | _SEQ
+_MAYBE_SEQUENCES = _SEQUENCES | _OTHER  # "other" may be a str or list too
+_SMALL = (_OTHER, 0, 64)
+
+# what _fill_env puts in a fresh env
+_ENV_BOUNDS = {
+    "hp": (_FLOAT, 0, 0),
+    "max_hp": (_FLOAT, 0, 0),
+    "x": (_FLOAT, 0, 0),
+    "y": (_FLOAT, 0, 0),
+    "name": (_STR, MAX_CONST_LEN, 0),
+    "tint": (_SEQ, 3, 0),
+    # event["type"], event["data"][...]: game data of unknown shape
+    "event": (_OTHER, MAX_CONST_LEN, 64),
+}
+
+
+def _join(a, b):
+    return (a[0] | b[0], max(a[1], b[1]), max(a[2], b[2]))
+
+
+def _check_bound(value):
+    if value[2] > MAX_INT_BITS:
+        raise ScriptBudgetError(f"Number may exceed {MAX_INT_BITS} bits")
+    if value[1] > MAX_SEQ_LEN:
+        raise ScriptBudgetError(f"String or list may exceed {MAX_SEQ_LEN} items")
+    return value
+
+
+def _check_value_sizes(tree):
+    names = dict(_ENV_BOUNDS)
+    wild = [_SMALL]  # bound for names set() wrote under a computed key
+    _bound_body(tree.body, names, wild)
+
+
+def _bound_body(body, names, wild, branch=False):
+    for stmt in body:
+        if isinstance(stmt, ast.Assign):
+            value = _bound(stmt.value, names, wild)
+            for target in stmt.targets:
+                _bound_store(target, value, stmt.value, names, wild, branch)
+        elif isinstance(stmt, ast.AugAssign):
+            op = ast.BinOp(left=_as_load(stmt.target), op=stmt.op, right=stmt.value)
+            value = _bound(op, names, wild)
+            _bound_store(stmt.target, value, None, names, wild, branch)
+        elif isinstance(stmt, ast.If):
+            # either branch may run: assignments inside join with the old
+            # bound instead of replacing it
+            _bound(stmt.test, names, wild)
+            _bound_body(stmt.body, names, wild, True)
+            _bound_body(stmt.orelse, names, wild, True)
+        elif isinstance(stmt, ast.Expr):
+            _bound(stmt.value, names, wild)
+
+
+def _as_load(target):
+    if isinstance(target, ast.Name):
+        return ast.Name(id=target.id, ctx=ast.Load())
+    return target
+
+
+def _bound_store(target, value, value_node, names, wild, branch):
+    if isinstance(target, ast.Name):
+        if branch:
+            value = _join(names.get(target.id, wild[0]), value)
+        names[target.id] = value
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        elts = None
+        if isinstance(value_node, (ast.Tuple, ast.List)) and len(value_node.elts) == len(target.elts):
+            elts = value_node.elts
+        for i, t in enumerate(target.elts):
+            if elts is not None:
+                _bound_store(t, _bound(elts[i], names, wild), elts[i], names, wild, branch)
+            else:
+                _bound_store(t, (_OTHER, value[1], value[2]), None, names, wild, branch)
+    elif isinstance(target, ast.Subscript):
+        # x[0] = v: x may now hold v
+        inner = target.value
+        while isinstance(inner, ast.Subscript):
+            inner = inner.value
+        if isinstance(inner, ast.Name):
+            old = names.get(inner.id, wild[0])
+            names[inner.id] = (old[0], max(old[1], value[1]), max(old[2], value[2]))
+
 
+def _bound(node, names, wild):
+    """Upper bound (kinds, length, bits) of an expression's value."""
+    if isinstance(node, ast.Constant):
+        v = node.value
+        if isinstance(v, bool):
+            return (_INT, 0, 1)
+        if isinstance(v, int):
+            return (_INT, 0, v.bit_length())
+        if isinstance(v, float):
+            return (_FLOAT, 0, 0)
+        if isinstance(v, (str, bytes)):
+            return (_STR, len(v), 0)
+        return (_OTHER, 0, 0)
+
+    if isinstance(node, ast.Name):
+        return names.get(node.id, wild[0])
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        length, bits = len(node.elts), 0
+        for e in node.elts:
+            b = _bound(e, names, wild)
+            length, bits = max(length, b[1]), max(bits, b[2])
+        return _check_bound((_SEQ, length, bits))
+
+    if isinstance(node, ast.Subscript):
+        container = _bound(node.value, names, wild)
+        _bound(node.slice, names, wild)
+        if isinstance(node.slice, ast.Slice):
+            return container
+        return (_OTHER, container[1], container[2])
+
+    if isinstance(node, ast.Slice):
+        for part in (node.lower, node.upper, node.step):
+            if part is not None:
+                _bound(part, names, wild)
+        return _SMALL
+
+    if isinstance(node, ast.UnaryOp):
+        b = _bound(node.operand, names, wild)
+        if isinstance(node.op, ast.Not):
+            return (_INT, 0, 1)
+        return b
+
+    if isinstance(node, ast.BoolOp):
+        result = _bound(node.values[0], names, wild)
+        for v in node.values[1:]:
+            result = _join(result, _bound(v, names, wild))
+        return result
+
+    if isinstance(node, ast.Compare):
+        _bound(node.left, names, wild)
+        for c in node.comparators:
+            _bound(c, names, wild)
+        return (_INT, 0, 1)
+
+    if isinstance(node, ast.Call):
+        args = [_bound(a, names, wild) for a in node.args]
+        for kw in node.keywords:
+            args.append(_bound(kw.value, names, wild))
+        fn = node.func.id if isinstance(node.func, ast.Name) else None
+        if fn == "roll":
+            # roll(n) <= n; roll("4d6") is capped by dice.MAX_DICE/MAX_SIDES
+            return (_INT, 0, max([64] + [a[2] for a in args]))
+        if fn == "set" and len(node.args) == 2:
+            key = node.args[0]
+            if isinstance(key, ast.Constant) and isinstance(key.value, str):
+                names[key.value] = _join(names.get(key.value, wild[0]), args[1])
+            else:
+                wild[0] = _join(wild[0], args[1])
+                for k in names:
+                    names[k] = _join(names[k], args[1])
+            return (_OTHER, 0, 0)
+        return (_OTHER, 0, max([64] + [a[2] for a in args]))
+
+    if isinstance(node, ast.BinOp):
+        return _check_bound(_bound_binop(node, names, wild))
+
+    return _SMALL
+
+
+def _bound_binop(node, names, wild):
+    left = _bound(node.left, names, wild)
+    right = _bound(node.right, names, wild)
+    op = node.op
+
+    if isinstance(op, ast.Add):
+        if (left[0] | right[0]) & _MAYBE_SEQUENCES:
+            return (left[0] | right[0], left[1] + right[1], max(left[2], right[2]))
+        return (_num_kinds(left, right), max(left[1], right[1]), max(left[2], right[2]) + 1)
+
+    if isinstance(op, ast.Mult):
+        for seq, count_node in ((left, node.right), (right, node.left)):
+            if seq[0] & _MAYBE_SEQUENCES:
+                n = _const_number(count_node)
+                if n is None or n > MAX_REPEAT_COUNT:
+                    raise ScriptBudgetError(
+                        f"Sequence repeat must be a literal of at most {MAX_REPEAT_COUNT}"
+                    )
+                return (seq[0], seq[1] * max(1, int(n)), seq[2])
+        return (_num_kinds(left, right), max(left[1], right[1]), left[2] + right[2])
+
+    if isinstance(op, ast.Mod) and "str" in left[0]:
+        raise ScriptBudgetError("String formatting with % is not allowed")
+
+    if isinstance(op, ast.Pow):
+        if left[0] == _FLOAT:
+            return left
+        n = abs(_const_number(node.right) or 0)
+        return (_num_kinds(left, right), left[1], max(1, left[2]) * max(1, int(n)))
+
+    if isinstance(op, ast.LShift):
+        n = abs(_const_number(node.right) or 0)
+        return (left[0], left[1], left[2] + int(n))
+
+    if isinstance(op, ast.Sub):
+        return (_num_kinds(left, right), max(left[1], right[1]), max(left[2], right[2]) + 1)
+
+    if isinstance(op, ast.Div):
+        return (_FLOAT, 0, 0)
+
+    # //, %, >>, &, |, ^ never grow past their operands
+    return (_num_kinds(left, right), max(left[1], right[1]), max(left[2], right[2]))
+
+
+def _num_kinds(a, b):
+    kinds = a[0] | b[0]
+    if kinds == _INT:
+        return _INT
+    if kinds <= _NUMBERS:
+        return _FLOAT
+    return _OTHER
+
+
+def _roll_value(n, rng=random):
+    """roll(20) -> 1..20, roll("4d6kh3+2") -> dice expression total."""
+    if isinstance(n, str) and not n.strip().isdigit():
+        try:
+            return dice.roll(n, rng)["total"]
+        except dice.DiceError as e:
+            print(f"[WARNING] roll({n!r}): {e}")
+            return 0
+    try:
+        n = int(n)
+    except Exception:
+        n = 1
+    if n < 1:
+        n = 1
+    return rng.randint(1, n)
+
+
+def _const_number(node):
+    """Value of a numeric literal (optionally signed), else None."""
+    sign = 1
+    while isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        if isinstance(node.op, ast.USub):
+            sign = -sign
+        node = node.operand
+    if (
+        isinstance(node, ast.Constant)
+        and isinstance(node.value, (int, float))
+        and not isinstance(node.value, bool)
+    ):
+        return sign * node.value
+    return None
+
+
+def _is_sequence_literal(node):
+    if isinstance(node, (ast.List, ast.Tuple)):
         return True
+    return isinstance(node, ast.Constant) and isinstance(node.value, (str, bytes))
+
+
+def _has_sequence_operand(node):
+    """Sequence literal among the operands of a BinOp chain (not call args)."""
+    if isinstance(node, ast.BinOp):
+        return _has_sequence_operand(node.left) or _has_sequence_operand(node.right)
+    if isinstance(node, ast.UnaryOp):
+        return _has_sequence_operand(node.operand)
+    return _is_sequence_literal(node)
@@ -42,11 +42,13 @@ class GameServer:
     - Clients send:
         { "type": "join", "client_id": "...", "name": "Player", "protocol_version": 1 }
         { "type": "token_update", "token": { ... token dict ... } }
+        { "type": "token_batch", "tokens": [ ... token dicts ... ], "deleted": [ ids ] }
         { "type": "chat", "from": "Player", "message": "..." }
         { "type": "ping" }
     - Server broadcasts:
         { "type": "state", "protocol_version": 1, "tokens": [...], "tilemap": ..., "background": ..., "campaign_meta": {...} }
         { "type": "token_update", "token": { ... } }
+        { "type": "token_batch", "tokens": [ ... ], "deleted": [ ... ] }
         { "type": "chat", "from": "Player", "message": "..." }
         { "type": "pong" }
         { "type": "error", "message": "..." }
@@ -144,6 +146,8 @@ class GameServer:
             self._handle_join(client, msg)
         elif mtype == "token_update":
             self._handle_token_update(client, msg)
+        elif mtype == "token_batch":
+            self._handle_token_batch(client, msg)
         elif mtype == "chat":
             self._handle_chat(client, msg)
         elif mtype == "ping":
@@ -216,6 +220,32 @@ class GameServer:
         out = {"type": "token_update", "token": token}
         self._broadcast(out)
 
+    def _handle_token_batch(self, client: ClientConnection, msg: dict):
+        batch = msg.get("tokens") or []
+        deleted = msg.get("deleted") or []
+        if not isinstance(batch, list) or not isinstance(deleted, list):
+            client.send({"type": "error", "message": "token_batch needs 'tokens' and 'deleted' lists"})
+            return
+
+        updates = [t for t in batch if isinstance(t, dict) and t.get("id")]
+        deleted_ids = {str(d) for d in deleted}
+
+        with self.state_lock:
+            tokens = self.state.setdefault("tokens", [])
+            index = {t.get("id"): i for i, t in enumerate(tokens)}
+            for token in updates:
+                i = index.get(token["id"])
+                if i is None:
+                    index[token["id"]] = len(tokens)
+                    tokens.append(token)
+                else:
+                    tokens[i] = token
+            if deleted_ids:
+                self.state["tokens"] = [t for t in tokens if t.get("id") not in deleted_ids]
+
+        out = {"type": "token_batch", "tokens": updates, "deleted": sorted(deleted_ids)}
+        self._broadcast(out)
+
     def _handle_chat(self, client: ClientConnection, msg: dict):
         text = msg.get("message", "")
         if not isinstance(text, str):
@@ -280,6 +280,8 @@ class TileMap:
         view_world_right = camera_x + board_rect.w / camera_zoom
         view_world_bottom = camera_y + board_rect.h / camera_zoom
 
+        size_screen = int(self.tile_size * camera_zoom)
+        visible = []
         for (tx, ty), tile in self.tiles.items():
             wx = tx * self.tile_size
             wy = ty * self.tile_size
@@ -295,26 +297,22 @@ class TileMap:
 
             sx = (wx - camera_x) * camera_zoom + board_rect.x
             sy = (wy - camera_y) * camera_zoom + board_rect.y
-            size_screen = int(self.tile_size * camera_zoom)
-
-            sprite_surf = None
-            if tile.sprite:
-                meta = asset_manager.assets.get(tile.sprite)
-                if meta:
-                    sprite_surf = meta.get("surface")
-
-            if sprite_surf is not None:
-                try:
-                    img = pygame.transform.smoothscale(
-                        sprite_surf,
-                        (size_screen, size_screen),
-                    )
-                except Exception:
-                    img = pygame.transform.scale(
-                        sprite_surf,
-                        (max(1, size_screen), max(1, size_screen)),
-                    )
-                screen.blit(img, (int(sx), int(sy)))
+            visible.append((tile, (int(sx), int(sy))))
+
+        # sprites: area blits from the atlas pages, pre-scaled to this zoom
+        atlas = asset_manager.tile_atlas
+        for sprite in {tile.sprite for tile, _ in visible if tile.sprite}:
+            if sprite not in atlas.index:
+                asset_manager.add_tile_sprite(sprite)
+        index = atlas.index
+        cells = atlas.cells(size_screen) if len(atlas) else []
+
+        blits = []
+        for tile, pos in visible:
+            idx = index.get(tile.sprite) if tile.sprite else None
+            if idx is not None:
+                page, area = cells[idx]
+                blits.append((page, pos, area))
             else:
                 # Fallback colored tiles by type
                 if tile.type == "floor":
@@ -329,5 +327,7 @@ class TileMap:
                 pygame.draw.rect(
                     screen,
                     col,
-                    pygame.Rect(int(sx), int(sy), size_screen, size_screen),
+                    pygame.Rect(pos[0], pos[1], size_screen, size_screen),
                 )
+        if blits:
+            screen.blits(blits, doreturn=False)
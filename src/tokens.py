@@ -0,0 +1,1157 @@
+import math
+import pygame
+import uuid
+
+
+# Level-of-detail thresholds by camera zoom:
+#   below "impostor"    -> sprite drawn from a small cached copy
+#   below "dot"         -> sprite replaced by a flat average-colour square
+#   below "decorations" -> HP bar, border and lock icon are skipped
+DEFAULT_LOD_POLICY = {
+    "impostor": 0.5,
+    "dot": 0.25,  # must stay above main.CAMERA_ZOOM_MIN (0.2) to ever apply
+    "decorations": 0.35,
+}
+
+# Formation patterns understood by TokenManager.spawn_many
+FORMATIONS = ("grid", "line", "column", "circle", "wedge")
+
+# Context menu actions that apply to the whole selection at once
+BATCH_ACTIONS = ("rotate_cw", "rotate_ccw", "scale_up", "scale_down", "delete", "lock", "unlock")
+
+
+def formation_offsets(count, formation="grid", spacing=64):
+    """
+    Return `count` (dx, dy) world offsets for a spawn formation, in
+    multiples of `spacing` so every token lands on a grid cell.
+    """
+    if count <= 0:
+        return []
+    spacing = spacing if spacing > 0 else 64
+
+    if formation == "line":
+        cells = [(i - count // 2, 0) for i in range(count)]
+    elif formation == "column":
+        cells = [(0, i - count // 2) for i in range(count)]
+    elif formation == "wedge":
+        # rows of 1, 2, 3, ... centred under the leader
+        cells = []
+        row = 0
+        while len(cells) < count:
+            for i in range(row + 1):
+                if len(cells) >= count:
+                    break
+                cells.append((2 * i - row, row))
+            row += 1
+    elif formation == "circle":
+        if count == 1:
+            cells = [(0, 0)]
+        else:
+            radius = max(1.0, count / (2.0 * math.pi))
+            cells = []
+            seen = set()
+            for i in range(count):
+                a = 2.0 * math.pi * i / count
+                cell = (round(math.cos(a) * radius), round(math.sin(a) * radius))
+                # ring too small to give each token its own cell: push outwards
+                while cell in seen:
+                    cell = (cell[0] + (1 if cell[0] >= 0 else -1), cell[1])
+                seen.add(cell)
+                cells.append(cell)
+    else:
+        cols = max(1, math.ceil(math.sqrt(count)))
+        cells = [(i % cols - cols // 2, i // cols) for i in range(count)]
+
+    return [(cx * spacing, cy * spacing) for cx, cy in cells]
+
+
+# (w, h) -> cached SRCALPHA surface holding a dotted rectangle outline
+_DOTTED_OUTLINES = {}
+_DOTTED_OUTLINES_MAX = 256
+
+
+def _dotted_outline(w, h, color=(200, 200, 200), step=6):
+    key = (w, h)
+    outline = _DOTTED_OUTLINES.get(key)
+    if outline is not None:
+        return outline
+
+    outline = pygame.Surface((max(1, w), max(1, h)), pygame.SRCALPHA)
+    for x in range(0, w, step):
+        outline.fill(color, (x, 0, 2, 2))
+        outline.fill(color, (x, h - 2, 2, 2))
+    for y in range(0, h, step):
+        outline.fill(color, (0, y, 2, 2))
+        outline.fill(color, (w - 2, y, 2, 2))
+
+    if len(_DOTTED_OUTLINES) >= _DOTTED_OUTLINES_MAX:
+        _DOTTED_OUTLINES.clear()
+    _DOTTED_OUTLINES[key] = outline
+    return outline
+
+
+class Token:
+    def __init__(self, asset_name, surface, x=0, y=0, source_scale=1.0):
+        self.id = str(uuid.uuid4())[:8]
+        self.asset = asset_name
+        self.original_surface = surface
+        self.surface = surface.copy()
+        # board pixels per surface pixel (AssetManager.source_scale): > 1 when
+        # the asset surface is a downscaled working copy of a larger image.
+        # surface stays at working-copy resolution; w/h are board sizes.
+        self.source_scale = source_scale
+
+        # world position
+        self.x = float(x)
+        self.y = float(y)
+
+        self.w = max(1, int(round(self.surface.get_width() * source_scale)))
+        self.h = max(1, int(round(self.surface.get_height() * source_scale)))
+
+        # dragging
+        self.dragging = False
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+        self.preview_x = None
+        self.preview_y = None
+        self.drag_start_x = float(self.x)
+        self.drag_start_y = float(self.y)
+
+        # visibility / transform
+        self.visible = True
+        self.rotation = 0
+        self.scale = 1.0
+
+        # properties
+        self.name = "Token"
+        self.hp = 1
+        self.max_hp = 1
+        self.notes = ""
+        self.gm_only_notes = False
+
+        # tint 0–1 floats
+        self.tint = (1.0, 1.0, 1.0)
+        self.border_style = "none"
+
+        # lock
+        self.locked = False
+
+        # grouping
+        self.group_id = None
+
+        # z-order
+        self.z_index = 0
+
+        # scripts per event_type, e.g. "onMove", "onSpawn", "onBatchAction", "onTurn", etc.
+        self.scripts = {}
+
+        # LOD caches (rebuilt lazily after every transform)
+        self._impostor = None
+        self._impostor_scaled = None
+        self._dot_color = None
+
+    # -----------------------------------------------------------
+    # INTERNAL HELPERS
+    # -----------------------------------------------------------
+
+    def rect(self):
+        return pygame.Rect(int(self.x), int(self.y), self.w, self.h)
+
+    def update_transformed_surface(self):
+        surf = self.original_surface
+
+        # scale (source_scale is applied when drawing, not here)
+        scale = self.scale
+        if scale != 1.0:
+            new_w = max(1, int(self.original_surface.get_width() * scale))
+            new_h = max(1, int(self.original_surface.get_height() * scale))
+            try:
+                surf = pygame.transform.smoothscale(self.original_surface, (new_w, new_h))
+            except Exception:
+                surf = pygame.transform.scale(self.original_surface, (new_w, new_h))
+
+        # rotate
+        if self.rotation != 0:
+            surf = pygame.transform.rotate(surf, self.rotation)
+
+        # tint
+        try:
+            arr = surf.copy()
+            tint_surf = pygame.Surface(arr.get_size(), pygame.SRCALPHA)
+            r = int(self.tint[0] * 255)
+            g = int(self.tint[1] * 255)
+            b = int(self.tint[2] * 255)
+            tint_surf.fill((r, g, b, 255))
+            arr.blit(tint_surf, (0, 0), special_flags=pygame.BLEND_MULT)
+            surf = arr
+        except Exception:
+            pass
+
+        self.surface = surf
+        self.w = max(1, int(round(surf.get_width() * self.source_scale)))
+        self.h = max(1, int(round(surf.get_height() * self.source_scale)))
+
+        self._impostor = None
+        self._impostor_scaled = None
+        self._dot_color = None
+
+    def _get_impostor(self, size, impostor_zoom):
+        """
+        Return the sprite at screen size `size`, scaled from a small copy
+        made once at impostor_zoom. The last result is kept, so a steady
+        camera zoom costs no scaling at all.
+        """
+        cached = self._impostor_scaled
+        if cached is not None and cached[0] == size:
+            return cached[1]
+
+        if self._impostor is None:
+            iw = max(1, int(self.w * impostor_zoom))
+            ih = max(1, int(self.h * impostor_zoom))
+            try:
+                self._impostor = pygame.transform.smoothscale(self.surface, (iw, ih))
+            except Exception:
+                self._impostor = pygame.transform.scale(self.surface, (iw, ih))
+
+        img = pygame.transform.scale(self._impostor, size)
+        self._impostor_scaled = (size, img)
+        return img
+
+    def _get_dot_color(self):
+        if self._dot_color is None:
+            try:
+                r, g, b, _ = pygame.transform.average_color(self.surface)
+                self._dot_color = (r, g, b)
+            except Exception:
+                self._dot_color = (200, 200, 200)
+        return self._dot_color
+
+    def _scaled_visible(self, dest, sx, sy, sw, sh):
+        """
+        self.surface scaled to (sw, sh) at screen (sx, sy), but only the part
+        inside dest's clip rect is scaled. Returns (image, position) or None.
+        """
+        src = self.surface
+        target = pygame.Rect(int(sx), int(sy), sw, sh)
+        vis = target.clip(dest.get_clip())
+        if vis.w <= 0 or vis.h <= 0:
+            return None
+        if vis.size != target.size:
+            src_w, src_h = src.get_size()
+            fx = src_w / float(sw)
+            fy = src_h / float(sh)
+            left = int((vis.x - target.x) * fx)
+            top = int((vis.y - target.y) * fy)
+            right = min(src_w, int(math.ceil((vis.right - target.x) * fx)))
+            bottom = min(src_h, int(math.ceil((vis.bottom - target.y) * fy)))
+            if right <= left or bottom <= top:
+                return None
+            src = src.subsurface((left, top, right - left, bottom - top))
+            # screen rect of exactly those source pixels (no jitter when panning)
+            x0 = target.x + int(round(left / fx))
+            y0 = target.y + int(round(top / fy))
+            target = pygame.Rect(
+                x0,
+                y0,
+                max(1, target.x + int(round(right / fx)) - x0),
+                max(1, target.y + int(round(bottom / fy)) - y0),
+            )
+        try:
+            img = pygame.transform.smoothscale(src, target.size)
+        except Exception:
+            img = pygame.transform.scale(src, target.size)
+        return img, target.topleft
+
+    def _world_to_screen_rect(self, camera_x, camera_y, camera_zoom, board_rect):
+        sx = (self.x - camera_x) * camera_zoom + board_rect.x
+        sy = (self.y - camera_y) * camera_zoom + board_rect.y
+        sw = self.w * camera_zoom
+        sh = self.h * camera_zoom
+        return pygame.Rect(int(sx), int(sy), int(sw), int(sh))
+
+    def is_in_view(self, view_left, view_top, view_right, view_bottom, margin=0.0):
+        """
+        Cheap world-space overlap test against the camera rectangle.
+        The HP bar hangs 12 world units below the sprite, so it is included
+        in the bounds; margin covers screen-space decorations (borders).
+        """
+        wx = self.preview_x if self.preview_x is not None else self.x
+        wy = self.preview_y if self.preview_y is not None else self.y
+        left = min(wx, self.x) - margin
+        top = min(wy, self.y) - margin
+        right = max(wx, self.x) + self.w + margin
+        bottom = max(wy, self.y) + self.h + 12 + margin
+        return (
+            right >= view_left
+            and left <= view_right
+            and bottom >= view_top
+            and top <= view_bottom
+        )
+
+    # -----------------------------------------------------------
+    # DRAWING
+    # -----------------------------------------------------------
+
+    def draw(
+        self,
+        surf,
+        camera_x,
+        camera_y,
+        camera_zoom,
+        board_rect,
+        selected=False,
+        lod=None,
+    ):
+        if not self.visible:
+            return
+
+        lod = lod or DEFAULT_LOD_POLICY
+
+        wx = self.preview_x if self.preview_x is not None else self.x
+        wy = self.preview_y if self.preview_y is not None else self.y
+
+        sx = (wx - camera_x) * camera_zoom + board_rect.x
+        sy = (wy - camera_y) * camera_zoom + board_rect.y
+
+        if camera_zoom < lod.get("dot", 0.0):
+            sw = max(1, int(self.w * camera_zoom))
+            sh = max(1, int(self.h * camera_zoom))
+            surf.fill(self._get_dot_color(), (int(sx), int(sy), sw, sh))
+        elif camera_zoom < lod.get("impostor", 0.0):
+            sw = max(1, int(self.w * camera_zoom))
+            sh = max(1, int(self.h * camera_zoom))
+            surf.blit(self._get_impostor((sw, sh), lod["impostor"]), (int(sx), int(sy)))
+        else:
+            # w/h include source_scale, so this maps the working copy to board size
+            sw = max(1, int(self.w * camera_zoom))
+            sh = max(1, int(self.h * camera_zoom))
+            scaled = self._scaled_visible(surf, sx, sy, sw, sh)
+            if scaled is not None:
+                surf.blit(*scaled)
+
+        if camera_zoom < lod.get("decorations", 0.0):
+            if selected:
+                r = self._world_to_screen_rect(camera_x, camera_y, camera_zoom, board_rect)
+                pygame.draw.rect(surf, (255, 255, 0), r.inflate(2, 2), 1)
+            return
+
+        # HP bar
+        if self.max_hp > 0:
+            bar_w_world = min(80, self.w)
+            bar_h_world = 8
+
+            bx_world = self.x + (self.w - bar_w_world) / 2
+            by_world = self.y + self.h + 4
+
+            bx = (bx_world - camera_x) * camera_zoom + board_rect.x
+            by = (by_world - camera_y) * camera_zoom + board_rect.y
+            bw = bar_w_world * camera_zoom
+            bh = bar_h_world * camera_zoom
+
+            pygame.draw.rect(
+                surf, (40, 40, 40), (int(bx), int(by), int(bw), int(bh)), border_radius=3
+            )
+
+            frac = max(0.0, min(1.0, self.hp / self.max_hp))
+            fw = int(bw * frac)
+
+            pygame.draw.rect(
+                surf, (160, 50, 50), (int(bx), int(by), fw, int(bh)), border_radius=3
+            )
+
+            pygame.draw.rect(
+                surf,
+                (80, 80, 80),
+                (int(bx), int(by), int(bw), int(bh)),
+                1,
+                border_radius=3,
+            )
+
+        # border
+        if self.border_style == "solid":
+            r = self._world_to_screen_rect(camera_x, camera_y, camera_zoom, board_rect)
+            pygame.draw.rect(surf, (220, 220, 220), r.inflate(4, 4), 2)
+        elif self.border_style == "dotted":
+            r = self._world_to_screen_rect(camera_x, camera_y, camera_zoom, board_rect)
+            if r.w > 0 and r.h > 0:
+                surf.blit(_dotted_outline(r.w, r.h), r.topleft)
+
+        # selection
+        if selected:
+            r = self._world_to_screen_rect(camera_x, camera_y, camera_zoom, board_rect)
+            pygame.draw.rect(surf, (255, 255, 0), r.inflate(4, 4), 2)
+
+        # lock indicator
+        if self.locked:
+            r = self._world_to_screen_rect(camera_x, camera_y, camera_zoom, board_rect)
+            s = max(8, int(12 * camera_zoom))
+            icon = pygame.Rect(r.right - s - 4, r.y + 4, s, s)
+            pygame.draw.rect(surf, (40, 40, 40), icon)
+            pygame.draw.rect(surf, (200, 200, 200), icon, 1)
+
+    def draw_preview(self, surf, camera_x, camera_y, camera_zoom, board_rect):
+        if self.preview_x is None or self.preview_y is None:
+            return
+        wx, wy = self.preview_x, self.preview_y
+        sx = (wx - camera_x) * camera_zoom + board_rect.x
+        sy = (wy - camera_y) * camera_zoom + board_rect.y
+
+        sw = max(1, int(self.w * camera_zoom))
+        sh = max(1, int(self.h * camera_zoom))
+        scaled = self._scaled_visible(surf, sx, sy, sw, sh)
+        if scaled is None:
+            return
+        img, (sx, sy) = scaled
+
+        try:
+            img.fill((255, 255, 255, 160), special_flags=pygame.BLEND_RGBA_MULT)
+        except Exception:
+            pass
+
+        surf.blit(img, (int(sx), int(sy)))
+
+    # -----------------------------------------------------------
+    # SAVE/LOAD
+    # -----------------------------------------------------------
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "asset": self.asset,
+            "x": self.x,
+            "y": self.y,
+            "rotation": self.rotation,
+            "scale": self.scale,
+            "visible": self.visible,
+            "name": self.name,
+            "hp": self.hp,
+            "max_hp": self.max_hp,
+            "notes": self.notes,
+            "gm_only_notes": self.gm_only_notes,
+            "tint": list(self.tint),
+            "border_style": self.border_style,
+            "locked": self.locked,
+            "group_id": self.group_id,
+            "z_index": self.z_index,
+            "scripts": dict(self.scripts),
+        }
+
+    @staticmethod
+    def from_dict(d, asset_surface_lookup, source_scale=None):
+        asset_name = d.get("asset")
+        if not asset_name:
+            return None
+
+        # dict of name -> surface, or an accessor such as AssetManager.get_surface
+        if callable(asset_surface_lookup):
+            surf = asset_surface_lookup(asset_name)
+        else:
+            surf = asset_surface_lookup.get(asset_name)
+        if not surf:
+            return None
+
+        t = Token(asset_name, surf, d.get("x", 0), d.get("y", 0))
+        if source_scale:
+            t.source_scale = source_scale(asset_name)  # applied below
+
+        t.id = d.get("id", t.id)
+        t.visible = d.get("visible", True)
+        t.rotation = d.get("rotation", 0)
+        t.scale = d.get("scale", 1.0)
+        t.name = d.get("name", "Token")
+        t.hp = d.get("hp", 1)
+        t.max_hp = d.get("max_hp", 1)
+        t.notes = d.get("notes", "")
+        t.gm_only_notes = d.get("gm_only_notes", False)
+
+        tint = d.get("tint", [1.0, 1.0, 1.0])
+        if any(v > 1 for v in tint):
+            t.tint = tuple(max(0, min(1, v / 255.0)) for v in tint)
+        else:
+            t.tint = tuple(max(0, min(1, float(v))) for v in tint)
+
+        t.border_style = d.get("border_style", "none")
+        t.locked = d.get("locked", False)
+        t.group_id = d.get("group_id", None)
+        t.z_index = d.get("z_index", 0)
+        t.scripts = dict(d.get("scripts", {}))
+
+        t.update_transformed_surface()
+        return t
+
+
+class TokenManager:
+    def __init__(self, asset_manager):
+        self.asset_manager = asset_manager
+        self.tokens = []
+        self.last_action = None
+
+        # selection: ordered list for the UI plus a set for O(1) lookups
+        self.selected_tokens = []
+        self._selected_set = set()
+
+        # group_id -> {token: None} (dict used as an ordered set)
+        self.groups = {}
+        self.selection_dragging = False
+        self.selection_start_world = (0.0, 0.0)
+        self.selection_end_world = (0.0, 0.0)
+
+        # tokens being dragged (set on mouse down, cleared on drop)
+        self.drag_tokens = []
+
+        # move events (for rule engine)
+        self.pending_move_events = []
+
+        # asset name -> tokens drawn with a stand-in until it is decoded
+        self.pending_assets = {}
+
+        # per-frame draw counters (filled by draw)
+        self.draw_stats = {"drawn": 0, "culled": 0}
+
+        # level-of-detail thresholds, see DEFAULT_LOD_POLICY
+        self.lod_policy = dict(DEFAULT_LOD_POLICY)
+
+    # -----------------------------------------------------------
+    # APPLY PROPERTIES (from PropertiesWindow)
+    # -----------------------------------------------------------
+
+    def apply_token_properties(self, token, newdata):
+        token.name = newdata.get("name", token.name)
+
+        max_hp_new = int(max(1, newdata.get("max_hp", token.max_hp)))
+        hp_new = int(newdata.get("hp", token.hp))
+        hp_new = max(0, min(max_hp_new, hp_new))
+        token.max_hp = max_hp_new
+        token.hp = hp_new
+
+        token.notes = newdata.get("notes", token.notes)
+        token.gm_only_notes = bool(newdata.get("gm_only_notes", token.gm_only_notes))
+
+        tint = newdata.get("tint", token.tint)
+        token.tint = tuple(max(0.0, min(1.0, float(v))) for v in tint)
+
+        token.border_style = newdata.get("border_style", token.border_style)
+
+        token.update_transformed_surface()
+
+    # -----------------------------------------------------------
+    # Z-INDEX HELPERS
+    # -----------------------------------------------------------
+
+    def _max_z(self):
+        return max((t.z_index for t in self.tokens), default=0)
+
+    def _min_z(self):
+        return min((t.z_index for t in self.tokens), default=0)
+
+    def _tokens_sorted_by_z(self, reverse=False):
+        return sorted(self.tokens, key=lambda t: t.z_index, reverse=reverse)
+
+    # -----------------------------------------------------------
+    # SPAWN
+    # -----------------------------------------------------------
+
+    def spawn_token(self, asset_name, x, y):
+        return self._spawn_at_z(asset_name, x, y, self._max_z() + 1)
+
+    def _spawn_at_z(self, asset_name, x, y, z_index):
+        surf = self.asset_manager.get_surface(asset_name)
+        if surf is None:
+            return None
+
+        t = Token(asset_name, surf, x, y, self.asset_manager.source_scale(asset_name))
+        t.name = asset_name
+        t.hp = 5
+        t.max_hp = 5
+        t.z_index = z_index
+
+        self.tokens.append(t)
+        self._index_group(t)
+        return t
+
+    def spawn_many(self, specs, x, y, formation="grid", grid_size=64):
+        """
+        Spawn a whole encounter in one call.
+
+        specs: list of asset names or dicts
+               {"asset": name, "count": 1, "name": ..., "hp": ..., "max_hp": ...}
+        x, y:  world position of the formation origin (snapped to grid_size)
+        formation: one of FORMATIONS
+
+        Returns the list of created tokens (unknown assets are skipped).
+        """
+        expanded = []
+        for spec in specs:
+            if isinstance(spec, str):
+                spec = {"asset": spec}
+            if not isinstance(spec, dict) or not spec.get("asset"):
+                continue
+            for _ in range(max(0, int(spec.get("count", 1)))):
+                expanded.append(spec)
+
+        if grid_size > 0:
+            x = round(x / grid_size) * grid_size
+            y = round(y / grid_size) * grid_size
+        offsets = formation_offsets(len(expanded), formation, grid_size)
+
+        z = self._max_z() + 1
+        spawned = []
+        for spec, (dx, dy) in zip(expanded, offsets):
+            t = self._spawn_at_z(spec["asset"], x + dx, y + dy, z)
+            if not t:
+                continue
+            if "name" in spec:
+                t.name = str(spec["name"])
+            if "max_hp" in spec:
+                t.max_hp = max(1, int(spec["max_hp"]))
+                t.hp = t.max_hp
+            if "hp" in spec:
+                t.hp = max(0, min(t.max_hp, int(spec["hp"])))
+            spawned.append(t)
+            z += 1
+        return spawned
+
+    def create_token_from_dict(self, d):
+        t = Token.from_dict(d, self.asset_manager.get_surface, self.asset_manager.source_scale)
+        if not t:
+            return None
+        t.z_index = self._max_z() + 1
+        self.tokens.append(t)
+        self._index_group(t)
+        return t
+
+    # -----------------------------------------------------------
+    # PIXEL-PERFECT PICKING
+    # -----------------------------------------------------------
+
+    def _pick_token_at_world(self, wx, wy):
+        for t in self._tokens_sorted_by_z(reverse=True):
+            if not t.visible:
+                continue
+
+            lx = wx - t.x
+            ly = wy - t.y
+            if lx < 0 or ly < 0 or lx >= t.w or ly >= t.h:
+                continue
+
+            # board units -> surface pixels (working copies are smaller)
+            px = min(t.surface.get_width() - 1, int(lx / t.source_scale))
+            py = min(t.surface.get_height() - 1, int(ly / t.source_scale))
+            try:
+                col = t.surface.get_at((px, py))
+            except Exception:
+                continue
+
+            if len(col) == 4 and col[3] > 0:
+                return t
+        return None
+
+    # -----------------------------------------------------------
+    # SELECTION HELPERS
+    # -----------------------------------------------------------
+
+    def _is_selected(self, t):
+        return t in self._selected_set
+
+    def _set_selection(self, tokens):
+        self.selected_tokens = list(tokens)
+        self._selected_set = set(self.selected_tokens)
+
+    def _set_single_selection(self, t):
+        self._set_selection([t] if t else [])
+
+    def _toggle_selection(self, t):
+        if t in self._selected_set:
+            self.selected_tokens.remove(t)
+            self._selected_set.discard(t)
+        else:
+            self.selected_tokens.append(t)
+            self._selected_set.add(t)
+
+    def _select_rect(self, x1, y1, x2, y2):
+        left = min(x1, x2)
+        right = max(x1, x2)
+        top = min(y1, y2)
+        bottom = max(y1, y2)
+        sel = []
+        for t in self.tokens:
+            r = t.rect()
+            if r.right >= left and r.left <= right and r.bottom >= top and r.top <= bottom:
+                sel.append(t)
+        self._set_selection(sel)
+
+    # -----------------------------------------------------------
+    # GROUP HELPERS
+    # -----------------------------------------------------------
+
+    def _index_group(self, t):
+        if t.group_id:
+            self.groups.setdefault(t.group_id, {})[t] = None
+
+    def _unindex_group(self, t):
+        members = self.groups.get(t.group_id)
+        if members is not None:
+            members.pop(t, None)
+            if not members:
+                del self.groups[t.group_id]
+
+    def set_token_group(self, t, gid):
+        """Change t.group_id and keep the group index in sync."""
+        if t.group_id == gid:
+            return
+        self._unindex_group(t)
+        t.group_id = gid
+        self._index_group(t)
+
+    def _tokens_in_group(self, gid):
+        return list(self.groups.get(gid, ()))
+
+    def _group_selected(self):
+        if len(self.selected_tokens) < 2:
+            return
+        gid = str(uuid.uuid4())
+        max_z = max(t.z_index for t in self.selected_tokens)
+        for t in self.selected_tokens:
+            self.set_token_group(t, gid)
+            t.z_index = max_z
+
+    def _ungroup(self, token):
+        if token.group_id:
+            gid = token.group_id
+            for t in self._tokens_in_group(gid):
+                self.set_token_group(t, None)
+        else:
+            for t in self.selected_tokens:
+                self.set_token_group(t, None)
+
+    # -----------------------------------------------------------
+    # Z-INDEX OPERATIONS
+    # -----------------------------------------------------------
+
+    def _bring_to_front(self, token):
+        max_z = self._max_z()
+        if token.group_id:
+            for t in self._tokens_in_group(token.group_id):
+                t.z_index = max_z + 1
+        else:
+            token.z_index = max_z + 1
+
+    def _send_to_back(self, token):
+        min_z = self._min_z()
+        if token.group_id:
+            for t in self._tokens_in_group(token.group_id):
+                t.z_index = min_z - 1
+        else:
+            token.z_index = min_z - 1
+
+    def _move_up_one(self, token):
+        if token.group_id:
+            group = self._tokens_in_group(token.group_id)
+            max_g = max(t.z_index for t in group)
+            above = [t for t in self.tokens if t.z_index > max_g]
+            if not above:
+                return
+            target = min(above, key=lambda t: t.z_index)
+            delta = target.z_index - max_g
+            for t in group:
+                t.z_index += delta
+        else:
+            above = [t for t in self.tokens if t.z_index > token.z_index]
+            if not above:
+                return
+            target = min(above, key=lambda t: t.z_index)
+            token.z_index, target.z_index = target.z_index, token.z_index
+
+    def _move_down_one(self, token):
+        if token.group_id:
+            group = self._tokens_in_group(token.group_id)
+            min_g = min(t.z_index for t in group)
+            below = [t for t in self.tokens if t.z_index < min_g]
+            if not below:
+                return
+            target = max(below, key=lambda t: t.z_index)
+            delta = min_g - target.z_index
+            for t in group:
+                t.z_index -= delta
+        else:
+            below = [t for t in self.tokens if t.z_index < token.z_index]
+            if not below:
+                return
+            target = max(below, key=lambda t: t.z_index)
+            token.z_index, target.z_index = target.z_index, token.z_index
+
+    # -----------------------------------------------------------
+    # EVENT HANDLING
+    # -----------------------------------------------------------
+
+    def handle_event(
+        self,
+        event,
+        grid_size,
+        snap_enabled,
+        camera_x,
+        camera_y,
+        camera_zoom,
+        board_rect,
+    ):
+        def to_world(pos):
+            sx, sy = pos
+            local_x = sx - board_rect.x
+            local_y = sy - board_rect.y
+            return (local_x / camera_zoom + camera_x, local_y / camera_zoom + camera_y)
+
+        ctrl = bool(pygame.key.get_mods() & pygame.KMOD_CTRL)
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if not board_rect.collidepoint(event.pos):
+                return None
+
+            wx, wy = to_world(event.pos)
+            t = self._pick_token_at_world(wx, wy)
+
+            if ctrl:
+                if t:
+                    self._toggle_selection(t)
+                return None
+
+            if t:
+                if not self._is_selected(t):
+                    self._set_single_selection(t)
+            else:
+                self.selection_dragging = True
+                self.selection_start_world = (wx, wy)
+                self.selection_end_world = (wx, wy)
+                return None
+
+            if not t.locked:
+                if t.group_id:
+                    drag_set = [x for x in self._tokens_in_group(t.group_id) if not x.locked]
+                elif len(self.selected_tokens) > 1 and t in self._selected_set:
+                    drag_set = [x for x in self.selected_tokens if not x.locked]
+                else:
+                    drag_set = [t]
+
+                self.drag_tokens = drag_set
+                for u in drag_set:
+                    u.dragging = True
+                    u.offset_x = wx - u.x
+                    u.offset_y = wy - u.y
+                    u.preview_x = u.x
+                    u.preview_y = u.y
+                    u.drag_start_x = u.x
+                    u.drag_start_y = u.y
+
+            return None
+
+        if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            if self.selection_dragging:
+                wx, wy = to_world(event.pos)
+                self.selection_end_world = (wx, wy)
+                self._select_rect(
+                    self.selection_start_world[0],
+                    self.selection_start_world[1],
+                    self.selection_end_world[0],
+                    self.selection_end_world[1],
+                )
+                self.selection_dragging = False
+
+            # drop dragged tokens and queue a single onMove event for the drag
+            moves = []
+            for t in self.drag_tokens:
+                from_x = t.drag_start_x
+                from_y = t.drag_start_y
+
+                t.dragging = False
+                if snap_enabled:
+                    if t.preview_x is not None:
+                        t.x = t.preview_x
+                        t.y = t.preview_y
+                    else:
+                        self._snap_token_to_grid(t, grid_size)
+                else:
+                    if t.preview_x is not None:
+                        t.x = t.preview_x
+                        t.y = t.preview_y
+
+                t.preview_x = None
+                t.preview_y = None
+
+                if from_x != t.x or from_y != t.y:
+                    moves.append({"token": t, "from": (from_x, from_y), "to": (t.x, t.y)})
+            self.drag_tokens = []
+
+            if moves:
+                # "token"/"from"/"to" describe the first moved token;
+                # "moves" lists every token moved by this drag
+                lead = moves[0]
+                self.pending_move_events.append(
+                    {
+                        "type": "onMove",
+                        "token": lead["token"],
+                        "from": lead["from"],
+                        "to": lead["to"],
+                        "moves": moves,
+                    }
+                )
+
+            return None
+
+        if event.type == pygame.MOUSEMOTION:
+            wx, wy = to_world(event.pos)
+
+            if self.selection_dragging:
+                self.selection_end_world = (wx, wy)
+                return None
+
+            for t in self.drag_tokens:
+                nx = wx - t.offset_x
+                ny = wy - t.offset_y
+
+                if snap_enabled:
+                    t.preview_x = round(nx / grid_size) * grid_size
+                    t.preview_y = round(ny / grid_size) * grid_size
+                else:
+                    t.x = nx
+                    t.y = ny
+                    t.preview_x = None
+                    t.preview_y = None
+
+            return None
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+            if not board_rect.collidepoint(event.pos):
+                return None
+
+            wx, wy = to_world(event.pos)
+            t = self._pick_token_at_world(wx, wy)
+            if t:
+                if not self._is_selected(t):
+                    self._set_single_selection(t)
+                return {"token": t, "pos": event.pos}
+
+        return None
+
+    def _snap_token_to_grid(self, token, grid_size):
+        if grid_size <= 0:
+            return
+        nx = round(token.x / grid_size) * grid_size
+        ny = round(token.y / grid_size) * grid_size
+        token.x, token.y = nx, ny
+
+    # -----------------------------------------------------------
+    # CONTEXT MENU ACTIONS
+    # -----------------------------------------------------------
+
+    def perform_menu_action(self, token, action):
+        if action in BATCH_ACTIONS:
+            # act on the whole selection when the clicked token is part of it
+            if len(self.selected_tokens) > 1 and token in self._selected_set:
+                self.perform_batch_action(action)
+            else:
+                self.perform_batch_action(action, [token])
+
+        elif action == "properties":
+            self.last_action = {"action": "properties", "token": token}
+
+        elif action == "group_selected":
+            self._group_selected()
+
+        elif action == "ungroup":
+            self._ungroup(token)
+
+        elif action == "z_front":
+            self._bring_to_front(token)
+
+        elif action == "z_back":
+            self._send_to_back(token)
+
+        elif action == "z_up":
+            self._move_up_one(token)
+
+        elif action == "z_down":
+            self._move_down_one(token)
+
+        elif action == "export_token":
+            self.last_action = {"action": "export_token", "token": token}
+
+    def perform_batch_action(self, action, tokens=None):
+        """
+        Apply one of BATCH_ACTIONS to `tokens` (default: the selection) in a
+        single pass. The result is left in last_action as
+        {"action": "batch", "op": action, "tokens": [tokens], "changed": [tokens],
+         "deleted": [ids]}
+        so the caller can fire one batched rules event and send one network
+        message for the whole batch.
+        """
+        tokens = list(self.selected_tokens if tokens is None else tokens)
+        changed = []
+        deleted = []
+
+        if action in ("rotate_cw", "rotate_ccw", "scale_up", "scale_down"):
+            for t in tokens:
+                if t.locked:
+                    continue
+                if action == "rotate_cw":
+                    t.rotation = (t.rotation - 45) % 360
+                elif action == "rotate_ccw":
+                    t.rotation = (t.rotation + 45) % 360
+                elif action == "scale_up":
+                    t.scale = round(t.scale * 1.1, 3)
+                else:
+                    t.scale = round(t.scale / 1.1, 3)
+                t.update_transformed_surface()
+                changed.append(t)
+
+        elif action == "delete":
+            gone = set(tokens)
+            self.tokens = [t for t in self.tokens if t not in gone]
+            for t in gone:
+                self._unindex_group(t)
+            if gone & self._selected_set:
+                self._set_selection([t for t in self.selected_tokens if t not in gone])
+            self.drag_tokens = [t for t in self.drag_tokens if t not in gone]
+            deleted = [t.id for t in tokens]
+
+        elif action in ("lock", "unlock"):
+            for t in tokens:
+                t.locked = action == "lock"
+            changed = tokens
+
+        else:
+            return
+
+        self.last_action = {
+            "action": "batch",
+            "op": action,
+            "tokens": tokens,
+            "changed": changed,
+            "deleted": deleted,
+        }
+
+    # -----------------------------------------------------------
+    # UPDATE & DRAW
+    # -----------------------------------------------------------
+
+    def update(self, dt):
+        pass
+
+    def draw(
+        self,
+        screen,
+        camera_x,
+        camera_y,
+        camera_zoom,
+        board_rect,
+        grid_size,
+        show_snap_preview,
+    ):
+        drawn = 0
+        culled = 0
+
+        # camera rectangle in world space; tokens outside it are skipped
+        # before any scaling or decoration work is done
+        view_left = camera_x
+        view_top = camera_y
+        view_right = camera_x + board_rect.w / camera_zoom
+        view_bottom = camera_y + board_rect.h / camera_zoom
+        margin = 4.0 / camera_zoom
+
+        for t in self._tokens_sorted_by_z():
+            if not t.visible:
+                continue
+            if not t.is_in_view(view_left, view_top, view_right, view_bottom, margin):
+                culled += 1
+                continue
+
+            drawn += 1
+            if t.dragging and show_snap_preview and t.preview_x is not None:
+                t.draw_preview(screen, camera_x, camera_y, camera_zoom, board_rect)
+            else:
+                t.draw(
+                    screen,
+                    camera_x,
+                    camera_y,
+                    camera_zoom,
+                    board_rect,
+                    selected=self._is_selected(t),
+                    lod=self.lod_policy,
+                )
+
+        self.draw_stats = {"drawn": drawn, "culled": culled}
+
+        if self.selection_dragging:
+            x1, y1 = self.selection_start_world
+            x2, y2 = self.selection_end_world
+            left = min(x1, x2)
+            right = max(x1, x2)
+            top = min(y1, y2)
+            bottom = max(y1, y2)
+
+            sx1 = (left - camera_x) * camera_zoom + board_rect.x
+            sy1 = (top - camera_y) * camera_zoom + board_rect.y
+            sx2 = (right - camera_x) * camera_zoom + board_rect.x
+            sy2 = (bottom - camera_y) * camera_zoom + board_rect.y
+
+            rect = pygame.Rect(int(sx1), int(sy1), int(sx2 - sx1), int(sy2 - sy1))
+            pygame.draw.rect(screen, (255, 255, 0), rect, 1)
+            pygame.draw.rect(screen, (255, 255, 0), rect.inflate(-2, -2), 1)
+
+    # -----------------------------------------------------------
+    # JSON IO
+    # -----------------------------------------------------------
+
+    def to_json(self):
+        return [t.to_dict() for t in self.tokens]
+
+    def load_from_json(self, data):
+        self.tokens = []
+        self._set_selection([])
+        self.groups = {}
+        self.selection_dragging = False
+        self.drag_tokens = []
+        self.pending_move_events = []
+        self.pending_assets = {}
+
+        # assets still being prefetched get an upscaled thumbnail for now;
+        # poll_pending_assets() swaps in the real surface later
+        am = self.asset_manager
+        standins = {}
+
+        def lookup(name):
+            surf = am.surface_if_ready(name)
+            if surf is None and name in am.assets:
+                surf = standins.get(name) or am.preview_surface(name)
+                if surf is not None:
+                    standins[name] = surf
+            return surf
+
+        def source_scale(name):
+            if name in standins:
+                return am.assets[name]["width"] / float(standins[name].get_width())
+            return am.source_scale(name)
+
+        for d in data:
+            t = Token.from_dict(d, lookup, source_scale)
+            if t:
+                self.tokens.append(t)
+                self._index_group(t)
+                if t.asset in standins:
+                    self.pending_assets.setdefault(t.asset, []).append(t)
+
+    def poll_pending_assets(self):
+        """
+        Give tokens created with a stand-in their decoded asset surface
+        (call once per frame). Returns the number of assets still pending.
+        """
+        for name in list(self.pending_assets):
+            surf = self.asset_manager.surface_if_ready(name)
+            if surf is None:
+                if not self.asset_manager.is_prefetching(name):
+                    del self.pending_assets[name]  # failed to decode: keep the stand-in
+                continue
+            scale = self.asset_manager.source_scale(name)
+            for t in self.pending_assets.pop(name):
+                t.original_surface = surf
+                t.source_scale = scale
+                t.update_transformed_surface()
+        return len(self.pending_assets)
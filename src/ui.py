@@ -1,5 +1,4 @@
 import pygame
-import os
 
 class Button:
     def __init__(self, text, x, y, w, h):
@@ -375,21 +374,35 @@ class AssetBrowserPanel:
     def _collect_asset_names(self):
         return list(self.asset_manager.assets.keys())
 
-    def _apply_sort_mode(self, names):
-        def meta(name):
-            return self.asset_manager.assets.get(name, {})
-
-        if self.sort_mode == "az":
-            names.sort(key=lambda n: n.lower())
-        elif self.sort_mode == "za":
-            names.sort(key=lambda n: n.lower(), reverse=True)
-        elif self.sort_mode == "size":
-            names.sort(key=lambda n: meta(n).get("size", 0), reverse=True)
-        elif self.sort_mode == "date":
-            names.sort(key=lambda n: meta(n).get("date_added", 0.0), reverse=True)
+    def _sort_key(self):
+        """(key, reverse) for the current sort mode."""
+        assets = self.asset_manager.assets
+        if self.sort_mode == "za":
+            return (lambda n: n.lower()), True
+        if self.sort_mode == "size":
+            return (lambda n: assets.get(n, {}).get("size", 0)), True
+        if self.sort_mode == "date":
+            return (lambda n: assets.get(n, {}).get("date_added", 0.0)), True
+        return (lambda n: n.lower()), False
 
+    def _apply_sort_mode(self, names):
+        key, reverse = self._sort_key()
+        names.sort(key=key, reverse=reverse)
         return names
 
+    def _matches(self, name, meta, search):
+        if self.active_category:
+            if self.asset_manager.category(name) != self.active_category:
+                return False
+
+        if search:
+            base = name.lower()
+            ext = name.split(".")[-1].lower() if "." in name else ""
+            if search not in base and search not in ext:
+                return False
+
+        return True
+
     def _rebuild_filtered_list(self):
         names = self._collect_asset_names()
         search = self.search_input.text.strip().lower()
@@ -397,33 +410,65 @@ class AssetBrowserPanel:
         filtered = []
         for name in names:
             meta = self.asset_manager.assets.get(name)
-            if not meta:
-                continue
-
-            if self.active_category:
-                base_dir = self.asset_manager.assets_dir
-                cat_path = self.active_category
-                full_prefix = os.path.join(base_dir, cat_path) + os.sep
-                if not meta["path"].startswith(full_prefix):
-                    continue
-
-            if search:
-                base = name.lower()
-                ext = name.split(".")[-1].lower() if "." in name else ""
-                if search not in base and search not in ext:
-                    continue
+            if meta and self._matches(name, meta, search):
+                filtered.append(name)
 
-            filtered.append(name)
-
-        filtered = self._apply_sort_mode(filtered)
+        self.filtered_names = self._apply_sort_mode(filtered)
+        self._update_scroll_range()
+        self._last_search_text = self.search_input.text
 
-        self.filtered_names = filtered
+    def _update_scroll_range(self):
         content_h = len(self.filtered_names) * self.item_height
-
         self.max_scroll = max(0, content_h - self.list_area.h)
         self.scroll = max(0, min(self.scroll, self.max_scroll))
 
-        self._last_search_text = self.search_input.text
+    def _insert_sorted(self, name):
+        key, reverse = self._sort_key()
+        k = key(name)
+        names = self.filtered_names
+        lo, hi = 0, len(names)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            km = key(names[mid])
+            if (km >= k) if reverse else (km <= k):
+                lo = mid + 1
+            else:
+                hi = mid
+        names.insert(lo, name)
+
+    def apply_asset_changes(self, added=(), changed=(), removed=()):
+        """
+        Patch the list after AssetManager.apply_changes instead of filtering
+        every asset again: drop removed/changed names and insert the ones
+        that still match at their sorted position.
+        """
+        assets = self.asset_manager.assets
+        if self._categories_changed(added, removed):
+            self._build_categories()
+            self._rebuild_filtered_list()
+            return
+
+        gone = set(changed) | set(removed)  # changed files may move (size)
+        if gone:
+            self.filtered_names = [n for n in self.filtered_names if n not in gone]
+        present = set(self.filtered_names)
+        search = self.search_input.text.strip().lower()
+        for name in list(added) + list(changed):
+            meta = assets.get(name)
+            if name not in present and meta and self._matches(name, meta, search):
+                self._insert_sorted(name)
+                present.add(name)
+        self._update_scroll_range()
+
+    def _categories_changed(self, added, removed):
+        assets = self.asset_manager.assets
+        for name in added:
+            if "/" in name and name in assets and name.split("/")[0] not in self.categories:
+                return True
+        for top in {n.split("/")[0] for n in removed if "/" in n}:
+            if top in self.categories and not any(n.startswith(top + "/") for n in assets):
+                return True
+        return False
 
     def _update_sort_mode_from_dropdown(self):
         idx = self.sort_dd.selected
@@ -631,9 +676,8 @@ class AssetBrowserPanel:
             size_txt = self.font.render(f"{size_kb} KB", True, (180, 180, 180))
             screen.blit(size_txt, (text_x, text_y + 18))
 
-            surf = meta.get("surface")
-            if surf:
-                w, h = surf.get_size()
+            w, h = meta.get("width"), meta.get("height")
+            if w and h:
                 dim_txt = self.font.render(f"{w}x{h}px", True, (160, 160, 160))
                 screen.blit(dim_txt, (text_x, text_y + 36))
 
@@ -1,28 +1,78 @@
 import random
 import json
 import os
-import hashlib
 from datetime import datetime
 
+import dice
 
-def roll_dice(sides=6):
-    return random.randint(1, sides)
+
+def roll_dice(sides=6, rng=None):
+    """
+    roll_dice(20) rolls one die; roll_dice("4d6kh3+2") rolls a dice
+    expression (see dice.py) and returns its total. rng: optional
+    random.Random-like stream (e.g. RNGService.stream("session")).
+    """
+    rng = rng or random
+    if isinstance(sides, str):
+        return dice.roll(sides, rng)["total"]
+    return rng.randint(1, sides)
 
 
-def _sha256_of_file(path):
+def campaign_manifest(data):
     """
-    Return SHA256 checksum in format 'sha256:<hex>' or None on error.
+    Assets a campaign actually uses, from its JSON dict:
+    {"assets": [names used by tokens and tiles], "background": path or ""}
     """
-    if not path or not os.path.exists(path):
-        return None
-    h = hashlib.sha256()
-    try:
-        with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(65536), b""):
-                h.update(chunk)
-    except OSError:
-        return None
-    return "sha256:" + h.hexdigest()
+    used = [td.get("asset") for td in data.get("tokens") or [] if isinstance(td, dict)]
+    tilemap_state = data.get("tilemap")
+    if isinstance(tilemap_state, dict):
+        used += [td.get("sprite") for td in tilemap_state.get("tiles", []) if isinstance(td, dict)]
+    bg_block = data.get("background")
+    return {
+        "assets": list(dict.fromkeys(n for n in used if n and n != "__missing__")),
+        "background": bg_block.get("path", "") if isinstance(bg_block, dict) else "",
+    }
+
+
+def preload_order(data, view_size=None):
+    """
+    Manifest asset names sorted for preloading: assets with an instance
+    inside the saved camera view first, then by distance from the view
+    center (screen pixels). view_size: (w, h) of the board in pixels.
+    """
+    names = campaign_manifest(data)["assets"]
+    bg_block = data.get("background")
+    cam = (bg_block.get("camera") if isinstance(bg_block, dict) else None) or {}
+    zoom = float(cam.get("zoom", 1.0)) or 1.0
+    vw, vh = view_size or (0, 0)
+    left, top = float(cam.get("x", 0.0)), float(cam.get("y", 0.0))
+    right, bottom = left + vw / zoom, top + vh / zoom
+    cx, cy = (left + right) / 2.0, (top + bottom) / 2.0
+
+    wanted = set(names)
+    best = {}  # name -> (not visible, distance)
+
+    def visit(name, x, y, w, h):
+        # tokens are taken as one 64 px cell; their size is not saved
+        if name not in wanted:
+            return
+        visible = x < right and x + w > left and y < bottom and y + h > top
+        d = (abs(x + w / 2.0 - cx) + abs(y + h / 2.0 - cy)) * zoom
+        key = (not visible, d)
+        if name not in best or key < best[name]:
+            best[name] = key
+
+    for td in data.get("tokens") or []:
+        if isinstance(td, dict) and td.get("asset"):
+            visit(td["asset"], float(td.get("x", 0)), float(td.get("y", 0)), 64, 64)
+    tilemap_state = data.get("tilemap")
+    if isinstance(tilemap_state, dict):
+        size = int(tilemap_state.get("tile_size", 64))
+        for td in tilemap_state.get("tiles", []):
+            if isinstance(td, dict) and td.get("sprite"):
+                visit(td["sprite"], td.get("x", 0) * size, td.get("y", 0) * size, size, size)
+
+    return sorted(names, key=lambda n: best.get(n, (True, 0.0)))
 
 
 def save_campaign(
@@ -48,20 +98,21 @@ def save_campaign(
     campaign_name = os.path.splitext(os.path.basename(path))[0]
     saved_at = datetime.utcnow().isoformat(timespec="seconds")
 
-    # assets block with checksum + mtime
+    # assets block with checksum + mtime (checksums cached by size/mtime)
+    sums = asset_mgr.checksums([meta.get("path", "") for meta in asset_mgr.assets.values()])
     assets_block = {}
     for name, meta in asset_mgr.assets.items():
         apath = meta.get("path", "")
-        checksum = _sha256_of_file(apath) if apath and os.path.exists(apath) else None
         try:
-            mtime = int(os.path.getmtime(apath)) if apath and os.path.exists(apath) else 0
+            mtime = int(os.path.getmtime(apath)) if apath else 0
         except OSError:
             mtime = 0
         assets_block[name] = {
             "path": apath,
-            "checksum": checksum,
+            "checksum": sums.get(apath),
             "last_modified": mtime,
         }
+    asset_mgr.save_checksums()
 
     # tokens
     tokens_raw = token_mgr.to_json()
@@ -114,6 +165,9 @@ def save_campaign(
     if rules_engine is not None:
         data["rules"] = rules_engine.to_json()
 
+    # assets actually used (for tools and preloading; assets lists all)
+    data["manifest"] = campaign_manifest(data)
+
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
@@ -121,7 +175,16 @@ def save_campaign(
     print(f"[INFO] Saved campaign: {os.path.basename(path)}")
 
 
-def load_campaign(path, asset_mgr, token_mgr, tilemap=None, rules_engine=None):
+def load_campaign(
+    path,
+    asset_mgr,
+    token_mgr,
+    tilemap=None,
+    rules_engine=None,
+    precompile_scripts=False,
+    prefetch_assets=False,
+    view_size=None,
+):
     """
     Load campaign (v1 or v2) from JSON.
 
@@ -131,10 +194,29 @@ def load_campaign(path, asset_mgr, token_mgr, tilemap=None, rules_engine=None):
     rules_engine: optional RulesEngine instance; if provided and JSON contains "rules",
                   rules_engine.load_from_json(...) is called.
 
+    precompile_scripts: if True (and rules_engine is given), all token, tile
+                  and global scripts are compiled in the background; the
+                  invalid-script report is in rules_engine.precompile_future.
+
+    prefetch_assets: if True, the background and the full-size images of
+                  assets used by tokens and tiles are decoded in parallel in
+                  the background: the background first, then assets visible
+                  in the saved camera view (view_size: board (w, h) in
+                  pixels), then the rest by distance (preload_order).
+                  Tokens whose asset is not decoded yet show an upscaled
+                  thumbnail; call asset_mgr.poll_prefetch() and
+                  token_mgr.poll_pending_assets() each frame to finish them.
+
+    Assets whose saved path is missing or whose content changed are looked
+    up by checksum (asset_mgr.find_by_checksum): in the asset store, then
+    in the asset library; a missing path falls back to the library asset
+    of the same name.
+
     Returns background_state or None:
     {
         "path": str or "",
-        "camera": { "x": float, "y": float, "zoom": float }
+        "camera": { "x": float, "y": float, "zoom": float },
+        "surface_future": Future of the decoded background (prefetch_assets only)
     }
     """
     if not path or not os.path.exists(path):
@@ -149,14 +231,29 @@ def load_campaign(path, asset_mgr, token_mgr, tilemap=None, rules_engine=None):
         return None
 
     version = data.get("version", 1)
+    manifest = campaign_manifest(data)
+    used = set(manifest["assets"])
 
     # --- ASSETS BLOCK (v2) ---
     assets_block = data.get("assets", {})
     placeholder_surf = asset_mgr.ensure_placeholder_asset()
 
     if isinstance(assets_block, dict):
+        # only assets the campaign uses are checked against their checksum
+        sums = asset_mgr.checksums(
+            [
+                info.get("path", "")
+                for name, info in assets_block.items()
+                if name in used and info.get("checksum")
+            ]
+        )
         for name, info in assets_block.items():
             apath = info.get("path", "")
+            expected = info.get("checksum")
+            if not apath or not os.path.exists(apath):
+                # saved on another machine: look the content up by checksum,
+                # or take the library asset of the same name
+                apath = asset_mgr.find_by_checksum(expected, name) or apath
             if not apath or not os.path.exists(apath):
                 print(f"[ERROR] Missing asset: {apath or name}")
                 asset_mgr.assets[name] = asset_mgr.assets.get(
@@ -172,12 +269,19 @@ def load_campaign(path, asset_mgr, token_mgr, tilemap=None, rules_engine=None):
                 )
                 continue
 
-            expected = info.get("checksum")
-            current = _sha256_of_file(apath)
+            current = sums.get(apath)
+            if current is None and expected:
+                current = asset_mgr.checksum(apath)  # path found by lookup
             if expected and current and expected != current:
-                print(f"[WARNING] Asset checksum mismatch: {name}")
+                original = asset_mgr.find_by_checksum(expected)
+                if original:
+                    apath = original
+                else:
+                    print(f"[WARNING] Asset checksum mismatch: {name}")
+
+            asset_mgr.ensure_asset(name, apath)
 
-            asset_mgr.load_or_get_asset(name, apath)
+        asset_mgr.save_checksums()
 
     # For version 1, also ensure any referenced assets are present
     if version == 1:
@@ -214,10 +318,17 @@ def load_campaign(path, asset_mgr, token_mgr, tilemap=None, rules_engine=None):
                     t["tint"] = new_vals
             fixed_tokens.append(t)
 
+    tilemap_state = data.get("tilemap")
+    bg_future = None
+    if prefetch_assets:
+        bg_path = manifest["background"]
+        if bg_path and os.path.exists(bg_path):
+            bg_future = asset_mgr.decode_async(bg_path)
+        asset_mgr.prefetch(preload_order(data, view_size))
+
     token_mgr.load_from_json(fixed_tokens)
 
     # --- TILEMAP BLOCK ---
-    tilemap_state = data.get("tilemap")
     if tilemap is not None:
         tilemap.load_from_json(tilemap_state)
 
@@ -226,6 +337,9 @@ def load_campaign(path, asset_mgr, token_mgr, tilemap=None, rules_engine=None):
     if rules_engine is not None and isinstance(rules_state, dict):
         rules_engine.load_from_json(rules_state)
 
+    if rules_engine is not None and precompile_scripts:
+        rules_engine.precompile_async(token_mgr.tokens, tilemap)
+
     # --- BACKGROUND STATE ---
     bg_state = None
     bg_block = data.get("background")
@@ -239,6 +353,8 @@ def load_campaign(path, asset_mgr, token_mgr, tilemap=None, rules_engine=None):
                 "zoom": float(cam.get("zoom", 1.0)),
             },
         }
+        if bg_future is not None:
+            bg_state["surface_future"] = bg_future
 
     print(f"[INFO] Loaded campaign: {os.path.basename(path)} (v{version})")
     return bg_state
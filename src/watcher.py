@@ -0,0 +1,269 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+
+
+# ----------------------------------------------------------------------
+# ASSET DIRECTORY WATCHER
+#
+# AssetWatcher(root, exts).poll() -> (added, changed, removed), lists of
+# names relative to root ("sub/file.png"). Uses inotify on Linux; other
+# platforms poll: directories whose mtime changed are re-listed, and
+# file contents are re-stat'ed only every `full_scan_every` polls (editing
+# a file in place does not touch its directory's mtime).
+# Folders starting with "." are ignored, like AssetManager.refresh_assets.
+# ----------------------------------------------------------------------
+
+# inotify constants (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class AssetWatcher:
+    def __init__(self, root, exts, interval_s=1.0, full_scan_every=10, use_inotify=True):
+        self.root = os.path.abspath(root)
+        self.exts = tuple(exts)
+        self.interval_s = interval_s
+        self.full_scan_every = full_scan_every
+
+        self._files = {}  # name -> (size, mtime_ns)
+        self._dirs = {}  # abs dir -> mtime_ns (polling)
+        self._wds = {}  # inotify watch descriptor -> abs dir
+        self._fd = None
+        self._libc = _load_libc() if use_inotify else None
+        self._last_poll = 0.0
+        self._polls = 0
+
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+        self._scan_tree(self.root, self._files)  # initial snapshot
+
+    @property
+    def backend(self):
+        return "inotify" if self._fd is not None else "polling"
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # ------------------------------------------------------------------
+
+    def poll(self):
+        """Return (added, changed, removed) since the last call."""
+        updates = {}  # name -> (size, mtime_ns) or None for removed
+        if self._fd is not None:
+            self._read_inotify(updates)
+        else:
+            now = time.monotonic()
+            if now - self._last_poll < self.interval_s:
+                return [], [], []
+            self._last_poll = now
+            self._poll_dirs(updates)
+
+        added, changed, removed = [], [], []
+        for name, st in updates.items():
+            old = self._files.get(name)
+            if st is None:
+                if old is not None:
+                    del self._files[name]
+                    removed.append(name)
+            elif old is None:
+                self._files[name] = st
+                added.append(name)
+            elif old != st:
+                self._files[name] = st
+                changed.append(name)
+        return added, changed, removed
+
+    # ------------------------------------------------------------------
+    # shared helpers
+
+    def _name(self, full):
+        return os.path.relpath(full, self.root).replace("\\", "/")
+
+    def _is_asset(self, fn):
+        return fn.lower().endswith(self.exts)
+
+    def _stat(self, full):
+        try:
+            st = os.stat(full)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _scan_tree(self, top, updates):
+        """Walk a (new) directory tree, registering dirs and reporting files."""
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            self._add_dir(root)
+            for fn in files:
+                if self._is_asset(fn):
+                    full = os.path.join(root, fn)
+                    st = self._stat(full)
+                    if st is not None:
+                        updates[self._name(full)] = st
+
+    def _add_dir(self, path):
+        if self._fd is not None:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+            if wd >= 0:
+                self._wds[wd] = path
+        else:
+            try:
+                self._dirs[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                pass
+
+    def _drop_prefix(self, path, updates):
+        prefix = self._name(path) + "/"
+        for name in self._files:
+            if name.startswith(prefix):
+                updates[name] = None
+        for d in [d for d in self._dirs if d == path or d.startswith(path + os.sep)]:
+            del self._dirs[d]
+
+    # ------------------------------------------------------------------
+    # inotify backend
+
+    def _read_inotify(self, updates):
+        while True:
+            try:
+                buf = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return
+            except OSError:
+                return
+            if not buf:
+                return
+            pos = 0
+            while pos < len(buf):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(buf, pos)
+                pos += _EVENT_HEADER.size
+                fn = buf[pos : pos + length].rstrip(b"\0").decode("utf-8", "replace")
+                pos += length
+                self._handle_event(wd, mask, fn, updates)
+
+    def _handle_event(self, wd, mask, fn, updates):
+        if mask & IN_Q_OVERFLOW:
+            self._resync(updates)
+            return
+        base = self._wds.get(wd)
+        if mask & IN_IGNORED:
+            self._wds.pop(wd, None)
+            return
+        if base is None or not fn:
+            return
+        full = os.path.join(base, fn)
+
+        if mask & IN_ISDIR:
+            if fn.startswith("."):
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._scan_tree(full, updates)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._drop_prefix(full, updates)
+            return
+
+        if not self._is_asset(fn):
+            return
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            updates[self._name(full)] = None
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            st = self._stat(full)
+            if st is not None:
+                updates[self._name(full)] = st
+
+    def _resync(self, updates):
+        # event queue overflowed: compare a fresh walk with what we know
+        seen = {}
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            if root not in self._wds.values():
+                self._add_dir(root)
+            for fn in files:
+                if self._is_asset(fn):
+                    full = os.path.join(root, fn)
+                    st = self._stat(full)
+                    if st is not None:
+                        seen[self._name(full)] = st
+        for name in self._files:
+            if name not in seen:
+                updates[name] = None
+        updates.update(seen)
+
+    # ------------------------------------------------------------------
+    # polling backend
+
+    def _poll_dirs(self, updates):
+        self._polls += 1
+        for path, old_mtime in list(self._dirs.items()):
+            if path not in self._dirs:
+                continue  # dropped with a removed parent
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                self._drop_prefix(path, updates)
+                continue
+            if mtime != old_mtime:
+                self._dirs[path] = mtime
+                self._relist_dir(path, updates)
+
+        if self.full_scan_every and self._polls % self.full_scan_every == 0:
+            for name in self._files:
+                if name not in updates:
+                    st = self._stat(os.path.join(self.root, name))
+                    updates[name] = st
+
+    def _relist_dir(self, path, updates):
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return
+        present = set()
+        for e in entries:
+            if e.is_dir(follow_symlinks=False):
+                if not e.name.startswith(".") and e.path not in self._dirs:
+                    self._scan_tree(e.path, updates)
+            elif self._is_asset(e.name):
+                name = self._name(e.path)
+                present.add(name)
+                st = self._stat(e.path)
+                if st is not None:
+                    updates[name] = st
+
+        # files directly in this directory that are gone
+        rel = self._name(path)
+        prefix = "" if rel == "." else rel + "/"
+        for name in self._files:
+            if name.startswith(prefix) and "/" not in name[len(prefix) :] and name not in present:
+                updates[name] = None
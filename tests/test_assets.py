@@ -0,0 +1,44 @@
+import pygame
+
+from assets import AssetManager
+
+
+def _png(path, color):
+    surf = pygame.Surface((8, 8))
+    surf.fill(color)
+    pygame.image.save(surf, str(path))
+    return str(path)
+
+
+def test_categories_in_store_mode(tmp_path):
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    src = tmp_path / "import"
+    src.mkdir()
+    mgr = AssetManager(str(tmp_path / "assets"), workers=1, use_store=True)
+    mgr.add_to_store(_png(src / "orc.png", (200, 0, 0)), "monsters/orc.png")
+    mgr.add_to_store(_png(src / "hero.png", (0, 200, 0)))
+
+    assert mgr.get_categories() == ["monsters"]
+
+    # a fresh start lists the same store aliases
+    again = AssetManager(str(tmp_path / "assets"), workers=1, use_store=True)
+    assert sorted(again.assets) == ["hero.png", "monsters/orc.png"]
+    assert again.get_categories() == ["monsters"]
+
+
+def test_refresh_keeps_assets_outside_library(tmp_path):
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    lib = tmp_path / "assets"
+    lib.mkdir()
+    _png(lib / "token.png", (0, 0, 200))
+    outside = _png(tmp_path / "campaign_orc.png", (200, 0, 0))
+    mgr = AssetManager(str(lib), workers=1)
+
+    assert mgr.ensure_asset("campaign_orc.png", outside)
+    mgr.prefetch(["campaign_orc.png"])
+    mgr.refresh_assets()
+
+    assert sorted(mgr.assets) == ["campaign_orc.png", "token.png"]
+    assert mgr.get_surface("campaign_orc.png") is not None
@@ -0,0 +1,42 @@
+import pygame
+
+from atlas import TileAtlas
+
+
+def _sprite(color):
+    surf = pygame.Surface((32, 32), pygame.SRCALPHA)
+    surf.fill(color)
+    return surf
+
+
+def test_buckets_stay_within_byte_cap():
+    sprites = {f"s{i}": _sprite((10 * i, 0, 0, 255)) for i in range(8)}
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        return sprites[name]
+
+    atlas = TileAtlas(max_buckets=100, max_bytes=200 * 1024, loader=loader)
+    for name, surf in sprites.items():
+        atlas.add(name, surf)
+    assert atlas._sources
+    atlas.cells(16)
+    assert not atlas._sources  # released once packed
+    assert loads == []
+
+    # wheel-zoom through many sizes
+    for size in range(17, 120):
+        cells = atlas.cells(size)
+        assert len(cells) == len(sprites)
+        assert atlas.bytes <= 200 * 1024 or len(atlas._buckets) == 1
+    assert len(atlas._buckets) < 10
+    assert set(loads) == set(sprites)  # later sizes refetch through the loader
+
+
+def test_bucket_count_cap():
+    atlas = TileAtlas(max_buckets=2)
+    atlas.add("a", _sprite((255, 0, 0, 255)))
+    for size in (8, 9, 10, 11):
+        atlas.cells(size)
+    assert list(atlas._buckets) == [10, 11]
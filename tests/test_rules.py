@@ -0,0 +1,54 @@
+import pytest
+
+from rules import RulesEngine, ScriptBudgetError
+
+
+@pytest.mark.parametrize(
+    "script",
+    [
+        "n = 10 ** 8\nf = event['type'] * n\ng = f + f",
+        "n = 10 ** 8\nf = event['data']['from'] * n",
+        "x = [1, 2] * 1000 * 1000",
+        'x = "%0999999999d" % 1',
+        "a = 9 ** 64\nb = a ** 64",
+    ],
+)
+def test_size_budget_rejects(script):
+    with pytest.raises(ScriptBudgetError):
+        RulesEngine().compile_script(script)
+
+
+@pytest.mark.parametrize(
+    "script",
+    [
+        "if hp < 10 then\nhp = hp + 2\nend",
+        "d = event['data']['dmg'] * 2\ndamage(d)",
+        "w = (hp * 3 + x * y) % 97 + roll(100) ** 2",
+    ],
+)
+def test_size_budget_allows(script):
+    RulesEngine().compile_script(script)
+
+
+class _Token:
+    def __init__(self, tid, script):
+        self.id = tid
+        self.hp = 10
+        self.max_hp = 10
+        self.x = self.y = 0.0
+        self.name = tid
+        self.tint = (1.0, 1.0, 1.0)
+        self.scripts = {"onTurn": script}
+
+
+def test_batch_event_data_is_per_token():
+    script = "damage(event['data']['dmg'])\nevent['data']['dmg'] = 9"
+    tokens = [_Token(str(i), script) for i in range(3)]
+    RulesEngine().run_event_batch("onTurn", tokens, {"dmg": 1})
+    assert [t.hp for t in tokens] == [9, 9, 9]
+
+
+def test_batch_error_skips_only_that_token():
+    tokens = [_Token("a", "damage(1)"), _Token("b", "damage(1)\nq = 1 / 0"), _Token("c", "damage(1)")]
+    RulesEngine().run_event_batch("onTurn", tokens)
+    assert [t.hp for t in tokens] == [9, 10, 9]